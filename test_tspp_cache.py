@@ -0,0 +1,58 @@
+""" Checks of the solution cache fingerprint and its eviction, run with pytest """
+import random
+import time
+
+import numpy as np
+
+import tspp_solver as ts
+from tspp_cache import SolutionCache, canonical_form
+
+
+def transformed(points, seed):
+    """ The points with the interior shuffled, mirrored left to right about the start and translated """
+    rng = random.Random(seed)
+    points = [(int(x), int(y)) for x, y in points]
+    interior = points[2:]
+    rng.shuffle(interior)
+    middle, dx, dy = points[0][0], rng.randint(-50, 50), rng.randint(-50, 50)
+    return [(2 * middle - x + dx, y + dy) for x, y in points[:2] + interior]
+
+
+def test_canonical_form_ignores_order_translation_and_reflection():
+    for seed in range(20):
+        points = ts.random_points(12, ts.LAYOUTS[seed % len(ts.LAYOUTS)], seed)
+        assert canonical_form(ts.Instance(points))[0] == canonical_form(ts.Instance(transformed(points, seed)))[0]
+
+
+def test_canonical_form_tells_different_instances_apart():
+    points = ts.random_points(12, seed=1)
+    moved = points.copy()
+    moved[-1, 0] += 1
+    assert canonical_form(ts.Instance(points))[0] != canonical_form(ts.Instance(moved))[0]
+
+
+def test_cached_path_is_renumbered_onto_an_equivalent_instance(tmp_path):
+    cache = SolutionCache(str(tmp_path / "solutions.sqlite"))
+    points = ts.random_points(10, seed=2)
+    path, distance = ts.held_karp_path(ts.Instance(points))
+    cache.put(ts.Instance(points), path, distance)
+    other = ts.Instance(transformed(points, 2))
+    cached_path, cached_distance = cache.get(other)
+    assert cached_distance == distance
+    assert other.valid_route(cached_path)
+    assert other.path_distance(cached_path) == distance
+
+
+def test_least_recently_used_path_is_evicted(tmp_path):
+    instances = [ts.Instance(ts.random_points(10, seed=seed)) for seed in range(3)]
+    # Room for the paths of two of the instances
+    cache = SolutionCache(str(tmp_path / "solutions.sqlite"), max_bytes=2 * 4 * 10)
+    for instance in instances[:2]:
+        cache.put(instance, *ts.held_karp_path(instance))
+        time.sleep(0.01)
+    assert cache.get(instances[0]) is not None
+    time.sleep(0.01)
+    cache.put(instances[2], *ts.held_karp_path(instances[2]))
+    assert len(cache) == 2
+    assert cache.get(instances[1]) is None
+    assert all(isinstance(cache.get(instance)[0], np.ndarray) for instance in (instances[0], instances[2]))
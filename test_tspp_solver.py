@@ -0,0 +1,307 @@
+""" Checks of the solvers against brute force and the original simple path greedy, run with pytest """
+import json
+import multiprocessing
+import random
+import time
+
+import pytest
+
+import tspp_solver as ts
+
+
+def grid_points(rng, count, steps):
+    """ The fixed start and end points and count points on a coarse grid, so many of them shield each other """
+    return [(550, 550), (550, 50)] + [(rng.randint(0, steps) * 400 // steps + 100, rng.randint(0, steps) * 400 // steps + 100)
+                                      for _ in range(count)]
+
+
+def small_instances(count, max_interior, seed):
+    """ Instances with up to max_interior points between start and end, half random layouts and half grids """
+    rng = random.Random(seed)
+    for i in range(count):
+        interior = rng.randint(0, max_interior)
+        if i % 2:
+            yield ts.Instance(grid_points(rng, interior, rng.choice([2, 4, 8])))
+        else:
+            yield ts.Instance(ts.random_points(interior + 2, rng.choice(ts.LAYOUTS), seed * count + i))
+
+
+def shielded(points, a, b, remaining):
+    """ Whether a point of remaining lies strictly inside the bounding box of a and b """
+    (ax, ay), (bx, by) = points[a], points[b]
+    return any(min(ax, bx) < points[p][0] < max(ax, bx) and min(ay, by) < points[p][1] < max(ay, by) for p in remaining)
+
+
+def route_distance(instance, path):
+    """ Distance of a path from start to end through every point, with no step shielded, None if it breaks a rule """
+    points = [instance.point(i) for i in range(instance.size)]
+    path = list(path)
+    if path[0] != instance.start_index or path[-1] != instance.end_index or sorted(path) != list(range(instance.size)):
+        return None
+    remaining = set(range(instance.size)) - {instance.start_index, instance.end_index}
+    distance = 0
+    for a, b in zip(path, path[1:]):
+        if b != instance.end_index and shielded(points, a, b, remaining):
+            return None
+        remaining.discard(b)
+        distance += abs(points[a][0] - points[b][0]) + abs(points[a][1] - points[b][1])
+    return distance
+
+
+def brute_force_distance(instance):
+    """ Shortest valid path distance by trying every order, inf when there is none """
+    points = [instance.point(i) for i in range(instance.size)]
+    end = instance.end_index
+    best = float("inf")
+
+    def extend(last, remaining, distance):
+        nonlocal best
+        if distance >= best:
+            return
+        if not remaining:
+            best = min(best, distance + abs(points[last][0] - points[end][0]) + abs(points[last][1] - points[end][1]))
+            return
+        for p in remaining:
+            if not shielded(points, last, p, remaining):
+                step = abs(points[last][0] - points[p][0]) + abs(points[last][1] - points[p][1])
+                extend(p, remaining - {p}, distance + step)
+
+    extend(instance.start_index, frozenset(range(instance.size)) - {instance.start_index, end}, 0)
+    return best
+
+
+def pair_loop_simple_path(instance, stats):
+    """ The simple path greedy as it was first written, scoring every pair of valid points """
+    x, y = instance.xs.tolist(), instance.ys.tolist()
+    current_path = [instance.start_index]
+    remaining = instance.interior_mask
+    while remaining:
+        remaining_excluding_current = list(ts.iter_bits(remaining & ~(1 << current_path[-1])))
+        if len(remaining_excluding_current) == 1:
+            best_point = remaining_excluding_current[0]
+        else:
+            best_point = None
+            best_score = float("inf")
+            leftmost_x = x[min(remaining_excluding_current, key=lambda p: x[p])]
+            lowest_y = y[max(remaining_excluding_current, key=lambda p: y[p])]
+            valid_points = [p for p in remaining_excluding_current if instance.valid_path(current_path[-1], p, remaining)]
+            stats.shielded += len(remaining_excluding_current) - len(valid_points)
+            for i in range(len(valid_points)):
+                for j in range(i + 1, len(valid_points)):
+                    point1, point2 = valid_points[i], valid_points[j]
+                    if y[point1] < y[point2]:
+                        higher_index, lower_index = point1, point2
+                    else:
+                        higher_index, lower_index = point2, point1
+                    higher_point_score = y[higher_index] - lowest_y
+                    lower_point_score = x[lower_index] - leftmost_x
+                    if higher_point_score < lower_point_score:
+                        score, candidate_point = higher_point_score, higher_index
+                    else:
+                        score, candidate_point = lower_point_score, lower_index
+                    if score < best_score:
+                        best_score, best_point = score, candidate_point
+        if best_point is None:
+            return None, float("inf")
+        stats.expanded += 1
+        current_path.append(best_point)
+        remaining &= ~(1 << best_point)
+    current_path.append(instance.end_index)
+    return current_path, instance.path_distance(ts.path_array(current_path))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_simple_path_picks_like_the_pair_loop(seed):
+    for instance in small_instances(100, 40, seed):
+        stats, reference_stats = ts.SolverStats(), ts.SolverStats()
+        path, distance = ts.simple_path(instance, stats=stats)
+        reference_path, reference_distance = pair_loop_simple_path(instance, reference_stats)
+        if reference_path is None:
+            assert path is None
+        else:
+            assert path.tolist() == reference_path
+            assert distance == reference_distance
+        assert (stats.expanded, stats.shielded) == (reference_stats.expanded, reference_stats.shielded)
+
+
+@pytest.mark.parametrize("solver", [ts.held_karp_path, ts.bidirectional_path, ts.branch_and_bound_path])
+def test_exact_solvers_match_brute_force(solver):
+    for instance in small_instances(120, 7, 1):
+        path, distance = solver(instance)
+        assert distance == brute_force_distance(instance)
+        if path is not None:
+            assert route_distance(instance, path) == distance
+
+
+def test_parallel_branch_and_bound_matches_brute_force():
+    for instance in small_instances(4, 9, 2):
+        stats = ts.SolverStats()
+        path, distance = ts.parallel_branch_and_bound_path(instance, workers=2, stats=stats)
+        assert distance == brute_force_distance(instance)
+        if path is not None:
+            assert route_distance(instance, path) == distance
+            assert stats.proven and stats.lower_bound == distance
+
+
+def test_bidirectional_matches_held_karp_beyond_brute_force():
+    for instance in small_instances(6, 14, 3):
+        assert ts.bidirectional_path(instance)[1] == ts.held_karp_path(instance)[1]
+
+
+def test_heuristic_paths_are_valid():
+    for instance in small_instances(40, 30, 4):
+        for solver in (ts.simple_path, ts.nearest_neighbor_path):
+            path, distance = solver(instance)
+            if path is not None:
+                assert route_distance(instance, path) == distance
+
+
+def test_time_limited_branch_and_bound_reports_its_gap():
+    instance = ts.Instance(ts.random_points(60, seed=7))
+    stats = ts.SolverStats()
+    path, distance = ts.branch_and_bound_path(instance, time_limit=0.05, stats=stats)
+    assert route_distance(instance, path) == distance
+    assert not stats.proven
+    assert 0 < stats.lower_bound <= distance
+
+
+def test_cancelled_parallel_search_worker_exits():
+    updates, cancel = multiprocessing.Queue(), multiprocessing.Event()
+    worker = multiprocessing.Process(target=ts.search_worker, args=(ts.random_points(40, seed=1), 0, 1, updates, cancel, 2))
+    worker.start()
+    time.sleep(0.5)
+    cancel.set()
+    while updates.get(timeout=10)[0] != "done":
+        pass
+    worker.join(10)
+    alive = worker.is_alive()
+    if alive:
+        worker.kill()
+    assert not alive
+
+
+def test_branch_and_bound_stays_exact_with_a_tiny_table():
+    evictions = 0
+    for instance in small_instances(60, 8, 5):
+        stats = ts.SolverStats()
+        path, distance = ts.branch_and_bound_path(instance, stats=stats, table_bytes=1024)
+        assert distance == brute_force_distance(instance)
+        evictions += stats.evictions
+    assert evictions
+
+
+def test_transposition_table_grows_before_evicting():
+    table = ts.TranspositionTable(1 << 20)
+    rng = random.Random(6)
+    while table.capacity < table.max_capacity:
+        assert table.record(rng.getrandbits(64) | 1, 1, 1)
+        assert table.stats.evictions == 0
+
+
+def test_local_search_time_limit_includes_setup():
+    instance = ts.Instance(ts.random_points(3000, seed=8))
+    started = time.perf_counter()
+    path, distance = ts.local_search_path(instance, time_limit=0.3)
+    assert time.perf_counter() - started < 0.4
+    assert route_distance(instance, path) == distance
+
+
+def test_command_line_reports_unreadable_sources_and_keeps_going(tmp_path, capsys):
+    good = tmp_path / "good.jsonl"
+    good.write_text("[[0, 0], [5, 5], [1, 1]]\nnot json\n")
+    status = ts.main(["--method", "simple", "--workers", "1", str(tmp_path / "missing.jsonl"), str(good)])
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert status == 1
+    assert [(result["line"], "error" in result) for result in results] == [(None, True), (1, False), (2, True)]
+    assert results[1]["distance"] == 10
+
+
+@pytest.mark.parametrize("exact", [False, True])
+def test_incremental_search_keeps_a_valid_route_across_edits(exact):
+    rng = random.Random(9)
+    for seed in range(6):
+        search = ts.IncrementalSearch(ts.Instance(ts.random_points(rng.choice([3, 8, 40]), ts.LAYOUTS[seed % 4], seed)),
+                                      exact=exact, exact_time_limit=0.05)
+        for _ in range(20):
+            size, choice = len(search.x), rng.random()
+            if choice < 0.4:
+                search.insert_point(rng.randint(100, 500), rng.randint(100, 500))
+            elif choice < 0.7 and size > 2:
+                i = rng.randrange(size)
+                if i in (search.start_index, search.end_index):
+                    with pytest.raises(ValueError):
+                        search.delete_point(i)
+                else:
+                    search.delete_point(i)
+            else:
+                search.move_point(rng.randrange(size), rng.randint(100, 500), rng.randint(100, 500))
+            path, distance = search.route
+            assert route_distance(search.instance, path) == distance
+            if exact and search.instance.size - 2 <= 7:
+                assert distance == brute_force_distance(search.instance)
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_binary_instance_round_trip(tmp_path, mmap):
+    instance = ts.Instance(ts.random_points(500, "duplicates", 10), 3, 7)
+    path, distance = ts.simple_path(instance)
+    filename = str(tmp_path / ("instance" + ts.BINARY_SUFFIX))
+    ts.save_binary(filename, instance, path, distance)
+    loaded, loaded_path, loaded_distance = ts.load_binary(filename, mmap=mmap)
+    assert (loaded.start_index, loaded.end_index) == (3, 7)
+    assert loaded.xs.tolist() == instance.xs.tolist() and loaded.ys.tolist() == instance.ys.tolist()
+    assert loaded_path.tolist() == path.tolist() and loaded_distance == distance
+
+    ts.save_binary(filename, instance)
+    assert ts.load_binary(filename, mmap=mmap)[1:] == (None, None)
+
+
+def test_saving_over_the_mapped_source_file(tmp_path):
+    filename = str(tmp_path / ("instance" + ts.BINARY_SUFFIX))
+    instance = ts.Instance(ts.random_points(100000, seed=11))
+    ts.save_binary(filename, instance)
+    loaded = ts.load_binary(filename)[0]
+    ts.save_binary(filename, loaded)
+    again = ts.load_binary(filename)[0]
+    assert again.xs.tolist() == instance.xs.tolist() and again.ys.tolist() == instance.ys.tolist()
+    assert list(tmp_path.iterdir()) == [tmp_path / ("instance" + ts.BINARY_SUFFIX)]
+
+
+def test_range_tree_matches_brute_force():
+    rng = random.Random(12)
+    for _ in range(300):
+        n, spread = rng.randint(0, 30), rng.choice([3, 6, 1000])
+        points = [(rng.randint(-spread, spread), rng.randint(-spread, spread)) for _ in range(n)]
+        xs, ys = ts.path_array([x for x, _ in points]), ts.path_array([y for _, y in points])
+        held = set(rng.sample(range(n), rng.randint(0, n)))
+        tree = ts.RangeTree(xs, ys, sorted(held))
+        removed = set()
+        for _ in range(rng.randint(0, 10)):
+            if held and rng.random() < 0.6:
+                p = rng.choice(sorted(held))
+                tree.remove(p)
+                held.remove(p)
+                removed.add(p)
+            elif removed:
+                p = rng.choice(sorted(removed))
+                tree.add(p)
+                removed.remove(p)
+                held.add(p)
+        assert len(tree) == len(held)
+        for _ in range(10):
+            x1, y1, x2, y2 = (rng.randint(-spread - 1, spread + 1) for _ in range(4))
+            inside = sum(min(x1, x2) < points[p][0] < max(x1, x2) and min(y1, y2) < points[p][1] < max(y1, y2) for p in held)
+            assert tree.count(x1, y1, x2, y2) == inside
+            x, y = rng.randint(-spread, spread), rng.randint(-spread, spread)
+            corner = [(x, y)] + points
+            expected = [p for p in sorted(held) if not shielded(corner, 0, p + 1, [q + 1 for q in held if q != p])]
+            assert sorted(tree.unshielded(x, y).tolist()) == expected
+
+
+def test_valid_route_matches_the_brute_force_check():
+    rng = random.Random(13)
+    for instance in small_instances(60, 12, 6):
+        path = [instance.start_index] + rng.sample(instance.interior, len(instance.interior)) + [instance.end_index]
+        assert instance.valid_route(path) == (route_distance(instance, path) is not None)
+        if instance.interior:
+            assert not instance.valid_route(path[:-2] + path[-1:])
@@ -1,8 +1,144 @@
 import tkinter as tk
-import random
+from tkinter import filedialog
 import math
+import multiprocessing
+import queue
 from itertools import permutations
 from itertools import combinations, permutations
+import numpy as np
+from tspp_cache import SolutionCache
+from tspp_solver import (BINARY_SUFFIX, IncrementalSearch, Instance, SolverStats, load_binary, manhattan_distance, random_points,
+                         save_binary, search_worker, simple_path, write_path)
+
+# Milliseconds between polls of a running background search
+SEARCH_POLL_MS = 100
+
+# Clicks within this many pixels of a point pick it, and within PATH_CLICK_TOLERANCE of a path select it
+POINT_CLICK_RADIUS = 10
+PATH_CLICK_TOLERANCE = 5
+
+# Side in pixels of the spatial grid cells used for click hit-testing
+GRID_CELL_SIZE = 20
+
+# Points falling in the same square of this many pixels overlap on screen and share one oval
+POINT_CLUSTER_SIZE = 4
+
+
+class SpatialGrid:
+    """ Uniform grid hashing items into square cells so lookups near a spot only touch a few cells.
+
+    Items are registered under every cell their bounding box overlaps and must be removed with the
+    same box.
+    """
+
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.bounds = None  # (min cx, min cy, max cx, max cy) of every cell ever used
+
+    def _cells(self, x1, y1, x2, y2):
+        size = self.cell_size
+        for cx in range(int(min(x1, x2) // size), int(max(x1, x2) // size) + 1):
+            for cy in range(int(min(y1, y2) // size), int(max(y1, y2) // size) + 1):
+                yield cx, cy
+
+    def insert(self, item, x1, y1, x2=None, y2=None):
+        x2, y2 = x1 if x2 is None else x2, y1 if y2 is None else y2
+        for cell in self._cells(x1, y1, x2, y2):
+            self.cells.setdefault(cell, set()).add(item)
+            cx, cy = cell
+            if self.bounds is None:
+                self.bounds = (cx, cy, cx, cy)
+            else:
+                low_x, low_y, high_x, high_y = self.bounds
+                self.bounds = (min(low_x, cx), min(low_y, cy), max(high_x, cx), max(high_y, cy))
+
+    def remove(self, item, x1, y1, x2=None, y2=None):
+        x2, y2 = x1 if x2 is None else x2, y1 if y2 is None else y2
+        for cell in self._cells(x1, y1, x2, y2):
+            bucket = self.cells.get(cell)
+            if bucket is not None:
+                bucket.discard(item)
+                if not bucket:
+                    del self.cells[cell]
+
+    def clear(self):
+        self.cells = {}
+        self.bounds = None
+
+    def near(self, x, y, radius=0):
+        """ Items registered in the cells overlapping the square of the given radius around (x, y) """
+        found = set()
+        for cell in self._cells(x - radius, y - radius, x + radius, y + radius):
+            found.update(self.cells.get(cell, ()))
+        return found
+
+    def nearest(self, x, y, distance):
+        """ Smallest distance(item) over all items, searching rings of cells outwards from (x, y).
+
+        distance must never be less than the larger of the x and y offsets, as for Manhattan distance.
+        """
+        if not self.cells:
+            return float("inf")
+        size = self.cell_size
+        cx, cy = int(x // size), int(y // size)
+        low_x, low_y, high_x, high_y = self.bounds
+        reach = max(cx - low_x, high_x - cx, cy - low_y, high_y - cy)
+        best = float("inf")
+        for ring in range(0, reach + 1):
+            # Anything in this ring or beyond is at least (ring - 1) cells away along x or y
+            if best <= (ring - 1) * size:
+                break
+            for kx in range(cx - ring, cx + ring + 1):
+                step = 1 if abs(kx - cx) == ring else 2 * ring
+                for ky in range(cy - ring, cy + ring + 1, max(step, 1)):
+                    for item in self.cells.get((kx, ky), ()):
+                        best = min(best, distance(item))
+        return best
+
+
+class PathTable:
+    """ Drawn path segments as parallel arrays of endpoint point indices and route canvas ids.
+
+    A segment's key is its row, so keys follow drawing order. Removed rows keep their place with
+    route -1 until the table is cleared.
+    """
+
+    def __init__(self, capacity=64):
+        self.starts = np.empty(capacity, dtype=np.int32)
+        self.ends = np.empty(capacity, dtype=np.int32)
+        self.routes = np.empty(capacity, dtype=np.int64)
+        self.size = 0  # rows in use, removed ones included
+        self.count = 0  # segments still drawn
+
+    def __len__(self):
+        return self.count
+
+    def add(self, start, end, route):
+        """ Append a segment and return its key """
+        if self.size == len(self.starts):
+            grow = len(self.starts)
+            self.starts = np.concatenate((self.starts, np.empty(grow, dtype=np.int32)))
+            self.ends = np.concatenate((self.ends, np.empty(grow, dtype=np.int32)))
+            self.routes = np.concatenate((self.routes, np.empty(grow, dtype=np.int64)))
+        key = self.size
+        self.starts[key], self.ends[key], self.routes[key] = start, end, route
+        self.size += 1
+        self.count += 1
+        return key
+
+    def remove(self, key):
+        self.routes[key] = -1
+        self.count -= 1
+
+    def segment(self, key):
+        return int(self.starts[key]), int(self.ends[key])
+
+    def segments(self):
+        """ (start, end) point indices of the drawn segments in drawing order """
+        keys = np.flatnonzero(self.routes[:self.size] >= 0)
+        return list(zip(self.starts[keys].tolist(), self.ends[keys].tolist()))
+
 
 class TSPPApp:
     def __init__(self, root):
@@ -16,18 +152,43 @@ class TSPPApp:
         # Crosshair tracking
         self.canvas.bind("<Motion>", self.update_crosshair)
 
-        # Points and paths
-        self.points = []
-        self.paths = []
+        # Points live in the instance and are referred to by index. Paths are single segments keyed
+        # in drawing order, and consecutive segments drawn together form a route rendered as one
+        # polyline, routes maps its canvas id to its keys
+        self.instance = None  # tspp_solver.Instance holding the point coordinates, rebuilt by generate_points
+        self.paths = PathTable()
+        self.routes = {}
+        self.crosshair = None  # canvas ids of the horizontal and vertical crosshair lines
         self.total_distance = 0
-        self.current_point = None
-        self.end_point = None
-        self.start_point = None
+        self.current_point = None  # index of the point a path is being drawn from
+        self.route = None  # point indices of the solver path on the canvas, if one is shown
+        self.editor = None  # IncrementalSearch repairing that path as points are edited, made on the first edit
+        self.dragged_point = None  # index of the point being dragged with shift held
+
+        # Spatial indexes for clicks: point indices, path keys, and the point indices at path ends
+        # with how many paths end there
+        self.point_grid = SpatialGrid()
+        self.path_grid = SpatialGrid()
+        self.endpoint_grid = SpatialGrid()
+        self.endpoint_counts = np.zeros(0, dtype=np.int32)
+
+        # Optimal paths found before, and the background optimal path search
+        self.solution_cache = SolutionCache()
+        self.search_process = None
+        self.search_updates = None
+        self.search_cancel = None
 
         # Labels and buttons (increased size by 20%)
         self.total_distance_label = tk.Label(root, text=f"Total Distance: {self.total_distance}", font=("Arial", 12))
         self.total_distance_label.pack()
 
+        # Stats of the last solver run
+        self.stats_label = tk.Label(root, text="", font=("Arial", 10))
+        self.stats_label.pack()
+
+        self.search_status_label = tk.Label(root, text="", font=("Arial", 12))
+        self.search_status_label.pack()
+
         self.point_input_label = tk.Label(root, text="Number of Points:", font=("Arial", 12))
         self.point_input_label.pack()
 
@@ -58,164 +219,49 @@ class TSPPApp:
         self.save_button = tk.Button(root, text="Save Path", font=("Arial", 12), command=self.save_path)
         self.save_button.pack()
 
+        self.save_instance_button = tk.Button(root, text="Save Instance", font=("Arial", 12), command=self.save_instance)
+        self.save_instance_button.pack()
+
+        self.load_instance_button = tk.Button(root, text="Load Instance", font=("Arial", 12), command=self.load_instance)
+        self.load_instance_button.pack()
+
         self.calculate_button = tk.Button(root, text="Calculate Optimal Path", font=("Arial", 12), command=self.calculate_optimal_path)
         self.calculate_button.pack()
 
+        self.cancel_button = tk.Button(root, text="Cancel", font=("Arial", 12), command=self.cancel_search, state=tk.DISABLED)
+        self.cancel_button.pack()
+
         # Bind left-click and right-click events
         self.canvas.bind("<Button-1>", self.on_left_click)
-        self.canvas.bind("<Button-3>", self.on_right_click)\
+        self.canvas.bind("<Button-3>", self.on_right_click)
+        # Shift-click adds a point or drags one, shift-right-click deletes one
+        self.canvas.bind("<Shift-Button-1>", self.on_shift_click)
+        self.canvas.bind("<ButtonRelease-1>", self.on_release)
+        self.canvas.bind("<Shift-Button-3>", self.on_shift_right_click)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
-    from itertools import combinations
-
-    def calculate_optimal_path(self):
-        """ Calculates the optimal path using BFS with pruning based on subset optimality """
-
-        # Dictionary to store the best distances for subsets of points (both direct and reverse)
-        subset_min_distances = {}
-
-        # Action counter
-        total_actions = 0
-
-        # BFS queue: each entry will be a tuple of (current_path, remaining_points, current_distance)
-        queue = [([self.start_point], set(self.points) - {self.start_point, self.end_point}, 0)]
-
-        while queue:
-            # Pop the first path from the queue (FIFO for BFS)
-            current_path, remaining_points, current_distance = queue.pop(0)
-            total_actions += 1  # Increment action count for each path expansion
-
-            # If no remaining points, calculate the final distance to the end point
-            if not remaining_points:
-                final_distance = current_distance + self.manhattan_distance(current_path[-1], self.end_point)
-                self.clear_paths()  # Clear any existing paths
-                for i in range(len(current_path) - 1):
-                    self.draw_box(current_path[i], current_path[i + 1])
-                self.draw_box(current_path[-1], self.end_point)  # Draw final connection to end point
-                print(f"Optimal Path Found with Distance: {final_distance}")
-                print(f"Total actions: {total_actions}")
-                return  # Exit as soon as we find the optimal path
-
-            # Only generate and compare subsets when there are at least 4 points in the path
-            if len(current_path) >= 4:
-                # Generate subsets of the current path (same start and end, size >= 4)
-                for i in range(1, len(current_path) - 2):  # Ignore the start and end points
-                    for j in range(i + 3, len(current_path) + 1):
-                        subset = current_path[i:j]
-
-                        # Get Manhattan distance for both direct and reverse order
-                        direct_distance = sum(self.manhattan_distance(subset[k], subset[k + 1]) for k in range(len(subset) - 1))
-                        reverse_subset = subset[::-1]
-                        reverse_distance = sum(self.manhattan_distance(reverse_subset[k], reverse_subset[k + 1]) for k in range(len(reverse_subset) - 1))
-
-                        # Check the best distance for this subset
-                        subset_key = tuple(subset)
-                        if subset_key in subset_min_distances:
-                            best_subset_distance = subset_min_distances[subset_key]
-                        else:
-                            best_subset_distance = min(direct_distance, reverse_distance)
-                            subset_min_distances[subset_key] = best_subset_distance
-
-                        # If the current path has a worse subset distance, prune it
-                        if min(direct_distance, reverse_distance) > best_subset_distance:
-                            # Prune the path
-                            break
-                else:
-                    # If no pruning happened, continue expanding the path
-                    for next_point in remaining_points:
-                        if self.valid_path(current_path[-1], next_point, remaining_points):
-                            new_distance = current_distance + self.manhattan_distance(current_path[-1], next_point)
-                            queue.append((current_path + [next_point], remaining_points - {next_point}, new_distance))
-            else:
-                # If fewer than 4 points, just continue expanding the path without subset pruning
-                for next_point in remaining_points:
-                    if self.valid_path(current_path[-1], next_point, remaining_points):
-                        new_distance = current_distance + self.manhattan_distance(current_path[-1], next_point)
-                        queue.append((current_path + [next_point], remaining_points - {next_point}, new_distance))
-
-        # If the loop finishes without finding an optimal path, print this message
-        print("No valid path found.")
-        print(f"Total actions: {total_actions}")
-    
-    def valid_path(self, from_point, to_point, remaining_points):
-        """ Check if the connection from from_point to to_point is valid (not shielded by unvisited points) """
-        x1, y1 = from_point
-        x2, y2 = to_point
-        for point in remaining_points:
-            px, py = point
-            if min(x1, x2) < px < max(x1, x2) and min(y1, y2) < py < max(y1, y2):
-                return False  # Shielded, so not a valid path
-        return True
     def simple_path_algorithm(self):
         """ Simple path selection algorithm based on pairwise comparison of valid points """
         
         # Reset the paths
         self.clear_paths()
-        
-        # Start the path with the start point
-        current_path = [self.start_point]
-        remaining_points = set(self.points) - {self.start_point, self.end_point}
-
-        while remaining_points:
-            # Exclude the current point from the remaining points when calculating leftmost/lowest
-            remaining_points_excluding_current = remaining_points - {current_path[-1]}
-
-            if len(remaining_points_excluding_current) == 1:
-                # If only one point is left, move directly to that point
-                best_point = next(iter(remaining_points_excluding_current))
-            else:
-                best_point = None
-                best_score = float("inf")
-
-                # Find the leftmost and lowest remaining points
-                leftmost_point = min(remaining_points_excluding_current, key=lambda p: p[0])  # Point with smallest x
-                lowest_point = max(remaining_points_excluding_current, key=lambda p: p[1])    # Point with largest y (lowest visually)
-
-                # Compare pairs of valid points
-                valid_points = [p for p in remaining_points_excluding_current if self.valid_path(current_path[-1], p, remaining_points)]
-
-                for i in range(len(valid_points)):
-                    for j in range(i + 1, len(valid_points)):
-                        point1 = valid_points[i]
-                        point2 = valid_points[j]
-
-                        # Identify which is higher and which is lower
-                        if point1[1] < point2[1]:  # point1 is higher, point2 is lower
-                            higher_point = point1
-                            lower_point = point2
-                        else:  # point2 is higher, point1 is lower
-                            higher_point = point2
-                            lower_point = point1
-
-                        # Calculate scores
-                        higher_point_score = higher_point[1] - lowest_point[1]  # y_higher - y_lowest
-                        lower_point_score = lower_point[0] - leftmost_point[0]  # x_lower - x_leftmost
-
-                        # Choose the point with the lower score
-                        if higher_point_score < lower_point_score:
-                            score = higher_point_score
-                            candidate_point = higher_point
-                        else:
-                            score = lower_point_score
-                            candidate_point = lower_point
-
-                        # If the candidate point has a better score, select it
-                        if score < best_score:
-                            best_score = score
-                            best_point = candidate_point
-
-            # Move to the best point
-            if best_point:
-                self.draw_box(current_path[-1], best_point)
-                current_path.append(best_point)
-                remaining_points.remove(best_point)
-            else:
-                print("No valid path found.")
-                return
 
-        # Finally, connect to the end point
-        self.draw_box(current_path[-1], self.end_point)
+        stats = SolverStats()
+        path, _ = simple_path(self.instance, stats=stats)
+        self.show_stats(stats)
+        if path is None:
+            print("No valid path found.")
+            return
+        self.draw_route(path)
+        self.route, self.editor = path, None
         print("Simple path completed.")
 
+    def show_stats(self, stats):
+        """ Show a SolverStats, or its as_dict() form, in the status area """
+        if isinstance(stats, dict):
+            stats = SolverStats.from_dict(stats)
+        self.stats_label.config(text=stats.summary())
+
     def toggle_labels(self):
         """ Toggle the visibility of the labels for all points """
         
@@ -225,8 +271,7 @@ class TSPPApp:
             self.labels_visible = False
         else:
             # If labels are not visible, display them
-            for i, point in enumerate(self.points):
-                x, y = point
+            for x, y in self.point_coords():
                 self.canvas.create_text(x, y+10, text=f"({x}, {y})", font=("Arial", 10), tags="point_label")
             self.labels_visible = True
 
@@ -242,34 +287,85 @@ class TSPPApp:
             self.show_error_popup("Please enter a valid number of points (2 or more).")
             return
         
+        # Generate random points after the start and end points, duplicates stay separate points
+        coords = random_points(num_points)
+        self.show_instance(Instance(coords, start_index=0, end_index=1))
+
+    def show_instance(self, instance):
+        """ Replace the points with those of an instance, clearing the canvas and any search """
         # Reset canvas and points
-        self.points = []
-        self.paths = []
+        self.stop_search()
+        self.route, self.editor = None, None
+        self.current_point = None
         self.canvas.delete("all")
-        
-        # Add start and end points
-        self.start_point = (550, 550)  # Bottom left
-        self.end_point = (550, 50)     # Top right
-        self.points.append(self.start_point)
-        self.points.append(self.end_point)
-        self.canvas.create_oval(545, 545, 555, 555, fill="red")  # Start point
-        self.canvas.create_oval(545, 45, 555, 55, fill="green")  # End point
-
-        # Generate random points (excluding start and end points)
-        for _ in range(num_points - 2):
-            x = random.randint(100, 500)
-            y = random.randint(100, 500)
-            point = (x, y)
-            self.points.append(point)
-            self.canvas.create_oval(x - 5, y - 5, x + 5, y + 5, fill="black")
-        
+        self.crosshair = None
+
+        # Index the instance once for the solvers, and the points for clicks
+        self.instance = instance
+        self.reset_path_index()
+        self.redraw_points()
+
         # Reset distance
         self.total_distance = 0
         self.update_total_distance_label()
 
-    def label_points(self):
-        for i, point in enumerate(self.points):
+    def save_instance(self):
+        """ Save the points, and the solver path shown if there is one, as a binary instance file """
+        if self.instance is None:
+            return
+        filename = filedialog.asksaveasfilename(defaultextension=BINARY_SUFFIX, filetypes=[("TSPP instances", "*" + BINARY_SUFFIX)])
+        if not filename:
+            return
+        distance = None if self.route is None else self.instance.path_distance(self.route)
+        try:
+            save_binary(filename, self.instance, self.route, distance)
+        except OSError as error:
+            self.show_error_popup(f"Could not save the instance: {error}")
+            return
+        print(f"Instance saved to {filename}")
+
+    def load_instance(self):
+        """ Load the points of a binary instance file and draw the path saved with them, if any """
+        filename = filedialog.askopenfilename(filetypes=[("TSPP instances", "*" + BINARY_SUFFIX)])
+        if not filename:
+            return
+        try:
+            instance, path, _ = load_binary(filename)
+        except (OSError, ValueError) as error:
+            self.show_error_popup(f"Could not load the instance: {error}")
+            return
+        self.show_instance(instance)
+        if path is None:
+            return
+        if not instance.valid_route(path):
+            self.show_error_popup("The path saved with the points is not a valid path, only the points were loaded.")
+            return
+        self.draw_path(np.array(path))
+
+    def redraw_points(self):
+        """ Draw the start point red, the end point green and the others black, and index them for clicks """
+        self.canvas.delete("point")
+        self.point_grid.clear()
+        interior = self.instance.interior
+        self.draw_points(self.instance.path_points(interior))
+        for point, color in ((self.instance.start_point, "red"), (self.instance.end_point, "green")):
             x, y = point
+            self.canvas.create_oval(x - 5, y - 5, x + 5, y + 5, fill=color, tags="point")
+        for i, (x, y) in enumerate(self.point_coords()):
+            self.point_grid.insert(i, x, y)
+        if self.labels_visible:
+            self.canvas.delete("point_label")
+            for x, y in self.point_coords():
+                self.canvas.create_text(x, y+10, text=f"({x}, {y})", font=("Arial", 10), tags="point_label")
+
+    def point_coords(self):
+        """ (x, y) tuples of every point, in index order """
+        if self.instance is None:
+            return []
+        return self.instance.path_points(np.arange(self.instance.size))
+
+    def label_points(self):
+        for i, (x, y) in enumerate(self.point_coords()):
             self.canvas.create_text(x + 10, y, text=str(i + 1), font=("Arial", 10))
 
     def on_left_click(self, event):
@@ -285,35 +381,134 @@ class TSPPApp:
             self.draw_box(self.current_point, clicked_point)
             self.current_point = None
 
-    def draw_box(self, point1, point2):
-        x1, y1 = point1
-        x2, y2 = point2
+    def on_shift_click(self, event):
+        """ Start dragging the point under the cursor, or add a point there if there is none """
+        if self.instance is None:
+            return
+        self.dragged_point = self.find_closest_point(event.x, event.y)
+        if self.dragged_point is None:
+            self.edit_points(lambda editor: editor.insert_point(event.x, event.y))
+
+    def on_release(self, event):
+        """ Drop a point dragged by on_shift_click where the button is released """
+        point, self.dragged_point = self.dragged_point, None
+        if point is None or self.instance.point(point) == (event.x, event.y):
+            return
+        self.edit_points(lambda editor: editor.move_point(point, event.x, event.y))
 
-        # Draw the rectangular box (Manhattan path)
-        horizontal_line = self.canvas.create_line(x1, y1, x2, y1, fill="blue", width=2)  # horizontal line
-        vertical_line = self.canvas.create_line(x2, y1, x2, y2, fill="blue", width=2)  # vertical line
+    def on_shift_right_click(self, event):
+        """ Delete the point under the cursor, other than the start and end points """
+        if self.instance is None:
+            return
+        point = self.find_closest_point(event.x, event.y)
+        if point is None or point in (self.instance.start_index, self.instance.end_index):
+            return
+        self.edit_points(lambda editor: editor.delete_point(point))
 
-        # Add the path to the list (path includes references to the drawn lines)
-        self.paths.append((point1, point2, horizontal_line, vertical_line))
+    def edit_points(self, edit):
+        """ Apply edit to the points through the IncrementalSearch, redrawing the solver path it repaired.
 
-        # Calculate Manhattan distance and update total
-        distance = abs(x1 - x2) + abs(y1 - y2)
-        self.total_distance += distance
+        Drawn paths that are not a solver path refer to points by index, so they are cleared instead.
+        """
+        self.stop_search()
+        self.current_point = None
+        if self.editor is None:
+            self.editor = IncrementalSearch(self.instance, self.route)
+        edit(self.editor)
+        self.instance = self.editor.instance
+        self.redraw_points()
+        if self.route is None:
+            self.clear_paths()
+            return
+        editor = self.editor
+        self.draw_path(editor.route[0])
+        self.editor = editor
+        self.search_status_label.config(text=f"Path repaired: {editor.length}")
+
+    def draw_points(self, points):
+        """ Draw points as black ovals, one per POINT_CLUSTER_SIZE square since closer ones overlap anyway """
+        clusters = {}
+        for x, y in points:
+            clusters.setdefault((x // POINT_CLUSTER_SIZE, y // POINT_CLUSTER_SIZE), (x, y))
+        for x, y in clusters.values():
+            self.canvas.create_oval(x - 5, y - 5, x + 5, y + 5, fill="black", tags="point")
+
+    def draw_box(self, point1, point2):
+        """ Draw a single Manhattan path between two point indices """
+        self.draw_route([point1, point2])
+        self.route = None
+
+    def draw_route(self, route):
+        """ Draw Manhattan paths between consecutive point indices as one polyline and add each to the paths """
+        route = np.asarray(route)
+        self.draw_polyline(route)
+        self.total_distance += self.instance.path_distance(route)
         self.update_total_distance_label()
 
+    def draw_polyline(self, route, keys=None):
+        """ Draw the segments between consecutive point indices as one canvas line, horizontal then vertical each.
+
+        New segments get fresh keys, segments of a split route keep their keys.
+        """
+        xs, ys = self.instance.xs[route], self.instance.ys[route]
+        coords = np.empty(4 * len(route) - 2, dtype=np.int64)
+        coords[0], coords[1] = xs[0], ys[0]
+        coords[2::4], coords[3::4] = xs[1:], ys[:-1]
+        coords[4::4], coords[5::4] = xs[1:], ys[1:]
+        line = self.canvas.create_line(*coords.tolist(), fill="blue", width=2, tags="path")
+        starts, ends = np.asarray(route[:-1]).tolist(), np.asarray(route[1:]).tolist()
+        if keys is None:
+            keys = [self.paths.add(start, end, line) for start, end in zip(starts, ends)]
+            for key, start, end in zip(keys, starts, ends):
+                self.index_path(key, start, end)
+        else:
+            self.paths.routes[keys] = line
+        self.routes[line] = keys
+        return line
+
     def find_closest_point(self, x, y):
-        for point in self.points:
-            px, py = point
-            if math.hypot(x - px, y - py) < 10:  # If click is close to a point
-                return point
-        return None
+        """ Index of the first point, in generation order, within POINT_CLICK_RADIUS of the click """
+        instance = self.instance
+        hits = [i for i in self.point_grid.near(x, y, POINT_CLICK_RADIUS)
+                if math.hypot(x - int(instance.xs[i]), y - int(instance.ys[i])) < POINT_CLICK_RADIUS]
+        return min(hits) if hits else None
+
+    def path_boxes(self, point1, point2):
+        """ Boxes around the horizontal and vertical lines of a path where a click selects it """
+        (x1, y1), (x2, y2) = self.instance.point(point1), self.instance.point(point2)
+        tolerance = PATH_CLICK_TOLERANCE
+        return [(min(x1, x2), y1 - tolerance, max(x1, x2), y1 + tolerance),
+                (x2 - tolerance, min(y1, y2), x2 + tolerance, max(y1, y2))]
+
+    def index_path(self, key, point1, point2):
+        for box in self.path_boxes(point1, point2):
+            self.path_grid.insert(key, *box)
+        for point in (point1, point2):
+            if self.endpoint_counts[point] == 0:
+                self.endpoint_grid.insert(point, *self.instance.point(point))
+            self.endpoint_counts[point] += 1
+
+    def unindex_path(self, key, point1, point2):
+        for box in self.path_boxes(point1, point2):
+            self.path_grid.remove(key, *box)
+        for point in (point1, point2):
+            self.endpoint_counts[point] -= 1
+            if self.endpoint_counts[point] == 0:
+                self.endpoint_grid.remove(point, *self.instance.point(point))
+
+    def reset_path_index(self):
+        self.paths = PathTable()
+        self.routes = {}
+        self.path_grid.clear()
+        self.endpoint_grid.clear()
+        self.endpoint_counts = np.zeros(0 if self.instance is None else self.instance.size, dtype=np.int32)
 
     def on_right_click(self, event):
         click_x, click_y = event.x, event.y
         clicked_point = self.find_closest_point(click_x, click_y)
 
         # Check if clicked on a point
-        if clicked_point:
+        if clicked_point is not None:
             # Show point information including coordinates
             info = self.get_point_info(clicked_point)
             self.show_info_popup(info, event)
@@ -321,10 +516,11 @@ class TSPPApp:
             # Check if clicked on a path and delete it
             self.delete_path_at_click(click_x, click_y)
 
-    def get_point_info(self, point):
+    def get_point_info(self, index):
+        point = self.instance.point(index)
         x, y = point
-        distance_from_end = 0 if self.end_point is None else self.manhattan_distance(point, self.end_point)
-        distance_from_current = 0 if self.current_point is None else self.manhattan_distance(point, self.current_point)
+        distance_from_end = manhattan_distance(point, self.instance.end_point)
+        distance_from_current = 0 if self.current_point is None else manhattan_distance(point, self.instance.point(self.current_point))
         distance_to_closest_path = self.distance_to_closest_path(point)
         return {
             "X Coordinate": x,
@@ -343,77 +539,82 @@ class TSPPApp:
             label = tk.Label(popup, text=f"{key}: {value}")
             label.pack()
 
-    def manhattan_distance(self, point1, point2):
-        x1, y1 = point1
-        x2, y2 = point2
-        return abs(x1 - x2) + abs(y1 - y2)
-
     def distance_to_closest_path(self, point):
-        if not self.paths:
-            return float("inf")
-        min_distance = float("inf")
-        for (p1, p2, _, _) in self.paths:
-            distance = min(self.manhattan_distance(point, p1), self.manhattan_distance(point, p2))
-            if distance < min_distance:
-                min_distance = distance
-        return min_distance
+        """ Manhattan distance from point to the closest endpoint of any path """
+        return self.endpoint_grid.nearest(point[0], point[1], lambda endpoint: manhattan_distance(point, self.instance.point(endpoint)))
 
     def update_total_distance_label(self):
         self.total_distance_label.config(text=f"Total Distance: {self.total_distance}")
 
     def delete_path_at_click(self, x, y):
-        """ Check if right-click occurred near any path, and if so, delete it. """
-        for path in self.paths:
-            point1, point2, line1, line2 = path
-            if self.is_click_near_line(x, y, point1, point2):
-                # Delete both lines and remove the path from the list
-                self.canvas.delete(line1)
-                self.canvas.delete(line2)
-                self.paths.remove(path)
-                
-                # Recalculate total distance after deletion
-                distance = self.manhattan_distance(point1, point2)
-                self.total_distance -= distance
-                self.update_total_distance_label()
-                return
+        """ Check if right-click occurred near any path, and if so, delete the first one drawn. """
+        if self.instance is None:
+            return
+        point = self.instance.point
+        hits = [key for key in self.path_grid.near(x, y)
+                if self.is_click_near_line(x, y, *map(point, self.paths.segment(key)))]
+        if not hits:
+            return
+        key = min(hits)
+        self.route = None
+        point1, point2 = self.paths.segment(key)
+
+        # Delete the route's line and redraw the segments before and after the deleted one
+        route = int(self.paths.routes[key])
+        self.canvas.delete(route)
+        keys = self.routes.pop(route)
+        position = keys.index(key)
+        for run in (keys[:position], keys[position + 1:]):
+            if run:
+                self.draw_polyline(np.append(self.paths.starts[run], self.paths.ends[run[-1]]), run)
+        self.paths.remove(key)
+        self.unindex_path(key, point1, point2)
+
+        # Recalculate total distance after deletion
+        distance = manhattan_distance(point(point1), point(point2))
+        self.total_distance -= distance
+        self.update_total_distance_label()
 
     def is_click_near_line(self, x, y, point1, point2):
         """ Check if the click is near the Manhattan box-shaped path between two points. """
         x1, y1 = point1
         x2, y2 = point2
+        tolerance = PATH_CLICK_TOLERANCE
         # Check horizontal line proximity
-        if y1 - 5 <= y <= y1 + 5 and min(x1, x2) <= x <= max(x1, x2):
+        if y1 - tolerance <= y <= y1 + tolerance and min(x1, x2) <= x <= max(x1, x2):
             return True
         # Check vertical line proximity
-        if x2 - 5 <= x <= x2 + 5 and min(y1, y2) <= y <= max(y1, y2):
+        if x2 - tolerance <= x <= x2 + tolerance and min(y1, y2) <= y <= max(y1, y2):
             return True
         return False
 
     def clear_paths(self):
         """ Clear all paths from the canvas and reset the path list and distance. """
-        for _, _, line1, line2 in self.paths:
-            self.canvas.delete(line1)
-            self.canvas.delete(line2)
-        self.paths = []
+        self.canvas.delete("path")
+        self.route = None
+        self.reset_path_index()
         self.total_distance = 0
         self.update_total_distance_label()
 
     def reset_all(self):
         """ Reset the entire canvas, clearing points and paths. """
-        self.points = []
-        self.paths = []
+        self.stop_search()
+        self.instance = None
+        self.route, self.editor = None, None
+        self.current_point = None
+        self.reset_path_index()
+        self.point_grid.clear()
         self.canvas.delete("all")
+        self.crosshair = None
         self.total_distance = 0
         self.update_total_distance_label()
 
     def save_path(self):
         if not self.paths:
             return
-        path_info = [f"Path {i+1}: {p1} -> {p2}" for i, (p1, p2, _, _) in enumerate(self.paths)]
-        total_info = f"Total Path Length: {self.total_distance}"
         with open("saved_path.txt", "w") as f:
-            f.write("\n".join(path_info))
-            f.write("\n" + total_info)
+            point = self.instance.point
+            write_path(f, ((point(p1), point(p2)) for p1, p2 in self.paths.segments()), self.total_distance)
         print("Path saved to saved_path.txt")
 
     def show_error_popup(self, message):
@@ -424,74 +625,118 @@ class TSPPApp:
 
     # New crosshair feature
     def update_crosshair(self, event):
-        self.canvas.delete("crosshair")
-        self.canvas.create_line(0, event.y, 600, event.y, fill="gray", dash=(2, 2), tags="crosshair")
-        self.canvas.create_line(event.x, 0, event.x, 600, fill="gray", dash=(2, 2), tags="crosshair")
+        if self.crosshair is None:
+            self.crosshair = (
+                self.canvas.create_line(0, event.y, 600, event.y, fill="gray", dash=(2, 2), tags="crosshair"),
+                self.canvas.create_line(event.x, 0, event.x, 600, fill="gray", dash=(2, 2), tags="crosshair"),
+            )
+            return
+        horizontal, vertical = self.crosshair
+        self.canvas.coords(horizontal, 0, event.y, 600, event.y)
+        self.canvas.coords(vertical, event.x, 0, event.x, 600)
 
     def calculate_optimal_path(self):
-        """ Calculates the optimal path using pruning and ensuring all points are visited """
-        
-        # Dictionary to store the shortest distance to a subset of points
-        min_distance_to_subset = {}
-        
-        # Action counter
-        path_count = 0
-        prune_count = 0
-       
-        # Recursive function to find the optimal path with pruning
-        def find_optimal_path(current_path, remaining_points, current_distance):
-            nonlocal path_count, prune_count
-
-            # If no remaining points, calculate the final distance to the end point
-            if not remaining_points:
-                final_distance = current_distance + self.manhattan_distance(current_path[-1], self.end_point)
-                return current_path + [self.end_point], final_distance
-
-            # Prune the path if a shorter distance to the same set of visited points exists
-            visited_key = (current_path[-1], frozenset(current_path))
-            if visited_key in min_distance_to_subset and min_distance_to_subset[visited_key] <= current_distance:
-                prune_count += 1  # Increment prune count
-                return None, float("inf")
-
-            # Update the minimum distance to the current subset of visited points
-            min_distance_to_subset[visited_key] = current_distance
-
-            # Explore all remaining points
-            optimal_subpath = None
-            optimal_subdistance = float("inf")
-            for next_point in remaining_points:
-                path_count += 1  # Increment path action count
-
-                # Check if the path to the next point is valid
-                if self.valid_path(current_path[-1], next_point, remaining_points):
-                    # Explore this path recursively
-                    new_remaining_points = remaining_points - {next_point}
-                    new_distance = current_distance + self.manhattan_distance(current_path[-1], next_point)
-                    subpath, subdistance = find_optimal_path(current_path + [next_point], new_remaining_points, new_distance)
-
-                    # If the subpath is valid and shorter, update the optimal path
-                    if subdistance < optimal_subdistance:
-                        optimal_subpath = subpath
-                        optimal_subdistance = subdistance
-
-            return optimal_subpath, optimal_subdistance
-
-        # Initialize the search from the start point
-        remaining_points = set(self.points) - {self.start_point, self.end_point}
-        optimal_path, optimal_distance = find_optimal_path([self.start_point], remaining_points, 0)
-
-        # After search is complete, draw the optimal path if found
-        if optimal_path:
-            self.clear_paths()  # Clear any existing paths
-            for i in range(len(optimal_path) - 1):
-                self.draw_box(optimal_path[i], optimal_path[i + 1])
-            print(f"Optimal Path Found with Distance: {optimal_distance}")
-            print(f"Total number of paths checked: {path_count}")
-            print(f"Total number of paths pruned: {prune_count}")
-        else:
-            print("No valid path found.")
+        """ Draw the cached optimal path, or start the search in a background process and poll it for progress """
+        if self.instance is None or self.search_process is not None:
+            return
+        cached = self.solution_cache.get(self.instance)
+        if cached is not None:
+            path, distance = cached
+            self.draw_path(path)
+            self.search_status_label.config(text=f"Optimal Path Found (cached): {distance}")
+            print(f"Optimal Path Found (cached) with Distance: {distance}")
+            return
+        self.search_updates = multiprocessing.Queue()
+        self.search_cancel = multiprocessing.Event()
+        self.search_process = multiprocessing.Process(
+            target=search_worker,
+            args=(self.instance.coords, self.instance.start_index, self.instance.end_index, self.search_updates, self.search_cancel),
+        )
+        self.search_process.start()
+        self.calculate_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.search_status_label.config(text="Searching...")
+        self.root.after(SEARCH_POLL_MS, self.poll_search)
+
+    def poll_search(self):
+        """ Drain the search updates, redraw the best path so far and reschedule until the search is done """
+        if self.search_process is None:
+            return
+        while True:
+            try:
+                message = self.search_updates.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "progress":
+                stats = message[1]
+                text = f"Expanded: {stats['expanded']}  Pruned: {stats['pruned']}  Best: {stats['best']}"
+                if stats.get("lower_bound") is not None:
+                    text += f"  Bound: {stats['lower_bound']}  Gap: {stats['gap']}"
+                self.search_status_label.config(text=text)
+                if "stats" in stats:
+                    self.show_stats(stats["stats"])
+                if stats["path"] is not None:
+                    self.draw_path(stats["path"])
+            else:
+                _, optimal_path, optimal_distance, cancelled, stats = message
+                self.finish_search()
+                self.show_stats(stats)
+                if optimal_path is not None:
+                    if not cancelled:
+                        self.solution_cache.put(self.instance, optimal_path, optimal_distance)
+                    self.draw_path(optimal_path)
+                    status = "Best path when cancelled" if cancelled else "Optimal Path Found"
+                    text = f"{status}: {optimal_distance}"
+                    if not stats.get("proven", True) and stats.get("lower_bound") is not None:
+                        text += f" (bound {stats['lower_bound']}, gap {optimal_distance - stats['lower_bound']})"
+                    self.search_status_label.config(text=text)
+                    print(f"{status} with Distance: {optimal_distance}")
+                else:
+                    self.search_status_label.config(text="Search cancelled" if cancelled else "No valid path found.")
+                    print("Search cancelled." if cancelled else "No valid path found.")
+                return
+        if not self.search_process.is_alive():
+            # The worker died without reporting back
+            self.finish_search()
+            self.search_status_label.config(text="Search failed")
+            return
+        self.root.after(SEARCH_POLL_MS, self.poll_search)
+
+    def cancel_search(self):
+        """ Ask a running search to stop, it reports its best path so far on the next poll """
+        if self.search_process is None:
+            return
+        self.search_cancel.set()
+        self.cancel_button.config(state=tk.DISABLED)
 
-   
+    def stop_search(self):
+        """ Stop a running search whose points are being replaced, without waiting for its result """
+        if self.search_process is None:
+            return
+        # Large searches run their own worker pool, which stops once it sees the cancel event
+        self.search_cancel.set()
+        self.search_process.join(timeout=1)
+        if self.search_process.is_alive():
+            self.search_process.terminate()
+        self.finish_search()
+
+    def on_close(self):
+        self.stop_search()
+        self.root.destroy()
+
+    def finish_search(self):
+        self.search_process.join(timeout=1)
+        self.search_process = None
+        self.search_updates = None
+        self.search_cancel = None
+        self.calculate_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+
+    def draw_path(self, path):
+        """ Replace the drawn paths with a path of point indices """
+        self.clear_paths()
+        self.draw_route(path)
+        self.route, self.editor = path, None
 
 if __name__ == "__main__":
     root = tk.Tk()
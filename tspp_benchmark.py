@@ -0,0 +1,188 @@
+""" Reproducible benchmarks of the TSPP solvers over instance sizes and point layouts.
+
+Every (solver, layout, size, seed) run solves the same seeded instance from random_points and records
+its wall time, peak traced memory, states expanded, gap to the optimum and SolverStats as JSON.
+Passing an earlier output as --baseline flags the runs that got slower, used more memory or found
+longer paths:
+
+    python tspp_benchmark.py --output baseline.json
+    python tspp_benchmark.py --output current.json --baseline baseline.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from tspp_solver import (HELD_KARP_MAX_POINTS, LAYOUTS, SOLVERS, TIME_LIMITED_SOLVERS, Instance, SolverStats, held_karp_path,
+                         random_points)
+
+# Instance sizes, counting the start and end points, swept by default
+DEFAULT_SIZES = [8, 12, 16, 20, 100, 1000]
+
+# Solvers benchmarked by default, the ones behind the app's buttons and the heuristics
+DEFAULT_SOLVERS = ["optimal", "simple", "nearest-neighbor", "local-search"]
+
+# Largest instance each solver is run on, the others run on every size
+SOLVER_MAX_POINTS = {
+    "optimal": HELD_KARP_MAX_POINTS + 2,
+    "held-karp": HELD_KARP_MAX_POINTS + 2,
+    "bidirectional": HELD_KARP_MAX_POINTS + 2,
+    "branch-and-bound": 24,
+    "parallel": 24,
+    "simple": 10000,
+}
+
+# Largest instance whose optimum is computed to report gaps, bigger ones report no gap
+REFERENCE_MAX_POINTS = 18
+
+# Seconds given to the time-limited solvers unless --time-limit says otherwise
+DEFAULT_TIME_LIMIT = 1.0
+
+# Relative slowdown or memory growth over the baseline that counts as a regression
+DEFAULT_TOLERANCE = 0.25
+
+# Time differences below this many seconds are noise and never flagged
+TIME_NOISE_FLOOR = 0.01
+
+
+def call_solver(method, instance, time_limit=None):
+    """ Run one solver, returns (path, distance, SolverStats) """
+    stats = SolverStats()
+    kwargs = {"stats": stats}
+    if time_limit is not None and method in TIME_LIMITED_SOLVERS:
+        kwargs["time_limit"] = time_limit
+    path, distance = SOLVERS[method](instance, **kwargs)
+    return path, distance, stats
+
+
+def run_case(method, instance, optimum, time_limit=None, repeat=1, memory=True):
+    """ Benchmark one solver on one instance.
+
+    The time is the fastest of repeat runs. Peak memory is measured in a separate run under
+    tracemalloc, which slows Python code down too much to time it at the same time.
+    """
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        path, distance, stats = call_solver(method, instance, time_limit)
+        times.append(time.perf_counter() - started)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            call_solver(method, instance, time_limit)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    found = path is not None
+    return {
+        "time": min(times),
+        "peak_memory": peak,
+        "expanded": stats.expanded,
+        "distance": distance if found else None,
+        "optimum": optimum,
+        "gap": (distance - optimum) / optimum if found and optimum else None,
+        "stats": stats.as_dict(),
+    }
+
+
+def run_benchmarks(solvers, layouts, sizes, seeds, time_limit=None, repeat=1, memory=True, log=None):
+    """ Benchmark every solver on every (layout, size, seed) instance it is not too slow for """
+    results = []
+    for layout in layouts:
+        for size in sizes:
+            for seed in range(seeds):
+                instance = Instance(random_points(size, layout, seed))
+                optimum = None
+                if size <= REFERENCE_MAX_POINTS:
+                    path, distance = held_karp_path(instance)
+                    optimum = distance if path is not None else None
+                for method in solvers:
+                    if size > SOLVER_MAX_POINTS.get(method, size):
+                        continue
+                    result = {"solver": method, "layout": layout, "size": size, "seed": seed}
+                    result.update(run_case(method, instance, optimum, time_limit, repeat, memory))
+                    results.append(result)
+                    if log is not None:
+                        log(result)
+    return results
+
+
+def case_key(result):
+    return result["solver"], result["layout"], result["size"], result["seed"]
+
+
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """ Compare results against the results of a baseline run, returns a message per regression """
+    previous = {case_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(case_key(result))
+        if before is None:
+            continue
+        case = "{} {} n={} seed={}".format(*case_key(result))
+        if result["time"] > before["time"] * (1 + tolerance) and result["time"] - before["time"] > TIME_NOISE_FLOOR:
+            regressions.append(f"{case}: time {before['time']:.4f}s -> {result['time']:.4f}s")
+        if result["peak_memory"] is not None and before["peak_memory"] is not None \
+                and result["peak_memory"] > before["peak_memory"] * (1 + tolerance):
+            regressions.append(f"{case}: peak memory {before['peak_memory']} -> {result['peak_memory']} bytes")
+        # Time-limited solvers return whatever they reached in time, so only the others must not get worse
+        if result["solver"] in TIME_LIMITED_SOLVERS or before["distance"] is None:
+            continue
+        if result["distance"] is None or result["distance"] > before["distance"]:
+            regressions.append(f"{case}: distance {before['distance']} -> {result['distance']}")
+    return regressions
+
+
+def print_result(result):
+    gap = "" if result["gap"] is None else f"  gap {result['gap']:.2%}"
+    memory = "" if result["peak_memory"] is None else f"  {result['peak_memory'] / 1e6:.2f} MB"
+    print(f"{result['solver']:>16} {result['layout']:>10} n={result['size']:<6} seed={result['seed']}"
+          f"  {result['time']:.4f}s{memory}  expanded {result['expanded']}  distance {result['distance']}{gap}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the TSPP solvers on seeded instances.")
+    parser.add_argument("--solvers", nargs="+", choices=sorted(SOLVERS), default=DEFAULT_SOLVERS)
+    parser.add_argument("--layouts", nargs="+", choices=LAYOUTS, default=list(LAYOUTS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="point counts including start and end")
+    parser.add_argument("--seeds", type=int, default=3, help="instances per layout and size")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per case, the fastest counts")
+    parser.add_argument("--time-limit", type=float, default=DEFAULT_TIME_LIMIT, help="seconds for the time-limited solvers")
+    parser.add_argument("--no-memory", action="store_true", help="skip the extra run that measures peak memory")
+    parser.add_argument("--output", help="write the results here as JSON (default: stdout)")
+    parser.add_argument("--baseline", help="results of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed relative slowdown and memory growth")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.solvers, args.layouts, args.sizes, args.seeds, args.time_limit,
+                             args.repeat, not args.no_memory, print_result)
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "time_limit": args.time_limit,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        sys.stdout.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f)["results"], args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+""" Persistent cache of optimal TSPP paths keyed by a canonical instance fingerprint.
+
+Two instances share a fingerprint when one can be turned into the other by reordering the points
+between start and end, translating, and applying a rotation or reflection of the plane that keeps
+the step from start to end the same. These maps keep Manhattan distances and axis-aligned boxes, so
+both instances have the same optimal paths up to renumbering the points.
+"""
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+import numpy as np
+
+# Where the app keeps its cache, and how many bytes of paths it keeps before evicting
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "tspp", "solutions.sqlite")
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Seconds to wait for another process holding the cache file locked
+CACHE_LOCK_TIMEOUT = 30
+
+# Rotations and reflections of the plane as (swap x and y, x sign, y sign)
+SYMMETRIES = [(swap, sx, sy) for swap in (False, True) for sx in (1, -1) for sy in (1, -1)]
+
+
+def canonical_form(instance):
+    """ Fingerprint of an instance and the point order it was taken in.
+
+    Returns (key, order) where key is a hex digest and order[c] is the index of the point at canonical
+    position c: the start point, the end point, then the other points sorted after translating the
+    start point to the origin and applying whichever of the symmetries fixing the end point gives the
+    smallest encoding.
+    """
+    start, end = instance.start_index, instance.end_index
+    xs = instance.xs.astype(np.int64) - int(instance.xs[start])
+    ys = instance.ys.astype(np.int64) - int(instance.ys[start])
+    interior = np.array(instance.interior, dtype=np.int64)
+    best = None
+    for swap, sx, sy in SYMMETRIES:
+        tx, ty = (ys, xs) if swap else (xs, ys)
+        tx, ty = sx * tx, sy * ty
+        if tx[end] != xs[end] or ty[end] != ys[end]:
+            continue
+        order = np.lexsort((ty[interior], tx[interior]))
+        inner = interior[order]
+        encoding = np.concatenate(([xs[end], ys[end]], np.column_stack((tx[inner], ty[inner])).ravel()))
+        encoding = encoding.astype("<i8").tobytes()
+        if best is None or encoding < best[0]:
+            best = (encoding, inner)
+    encoding, inner = best
+    key = hashlib.sha256(b"tspp-l1-path:" + encoding).hexdigest()
+    return key, np.concatenate(([start, end], inner)).astype(np.int32)
+
+
+class SolutionCache:
+    """ Optimal paths in a SQLite file, keyed by canonical_form and capped at max_bytes of paths.
+
+    get() returns a stored path renumbered onto the instance asked about, and marks it as recently
+    used. put() evicts the least recently used paths once the cap is exceeded. The cache is only ever
+    an optimization, so a file that cannot be opened or read behaves like an empty cache.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=CACHE_LOCK_TIMEOUT)
+        db.execute("CREATE TABLE IF NOT EXISTS solutions ("
+                   "key TEXT PRIMARY KEY, path BLOB NOT NULL, distance INTEGER NOT NULL, used REAL NOT NULL)")
+        return db
+
+    def get(self, instance):
+        """ (path, distance) of the instance's optimal path if it is cached, otherwise None """
+        key, order = canonical_form(instance)
+        try:
+            with closing(self._connect()) as db, db:
+                row = db.execute("SELECT path, distance FROM solutions WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                db.execute("UPDATE solutions SET used = ? WHERE key = ?", (time.time(), key))
+        except (sqlite3.Error, OSError):
+            return None
+        positions = np.frombuffer(row[0], dtype="<i4")
+        if len(positions) != len(order) or positions.min() < 0 or positions.max() >= len(order):
+            return None
+        path = order[positions]
+        if instance.path_distance(path) != row[1]:
+            return None
+        return path, row[1]
+
+    def put(self, instance, path, distance):
+        """ Store an optimal path of the instance """
+        key, order = canonical_form(instance)
+        positions = np.empty(len(order), dtype=np.int32)
+        positions[order] = np.arange(len(order), dtype=np.int32)
+        blob = positions[np.asarray(path)].astype("<i4").tobytes()
+        try:
+            with closing(self._connect()) as db, db:
+                db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)", (key, blob, int(distance), time.time()))
+                db.execute("DELETE FROM solutions WHERE key IN (SELECT key FROM ("
+                           "SELECT key, SUM(LENGTH(path)) OVER (ORDER BY used DESC, key) AS total FROM solutions"
+                           ") WHERE total > ?)", (self.max_bytes,))
+        except (sqlite3.Error, OSError):
+            pass
+
+    def clear(self):
+        try:
+            with closing(self._connect()) as db, db:
+                db.execute("DELETE FROM solutions")
+        except (sqlite3.Error, OSError):
+            pass
+
+    def __len__(self):
+        try:
+            with closing(self._connect()) as db:
+                return db.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+        except (sqlite3.Error, OSError):
+            return 0
@@ -0,0 +1,2215 @@
+""" Headless solvers for the travelling salesman path problem in L1 R2.
+
+This module has no tkinter dependency so it can run on display-less machines. Instances keep their
+coordinates in int32 arrays with fixed start and end points, points are referred to by index so
+duplicates stay distinct, and paths are int32 arrays of point indices. Run it as a script
+to solve JSON-lines instances from files or stdin across a process pool:
+
+    python tspp_solver.py --method held-karp --workers 8 instances.jsonl > results.jsonl
+
+Each input line is either a list of [x, y] points or an object {"points": [...], "start": 0, "end": 1}.
+Sources ending in .tspp are binary instance files written by save_binary, which are memory-mapped.
+"""
+import argparse
+import array
+import heapq
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+import struct
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
+
+import numpy as np
+
+from tspp_cache import SolutionCache
+
+# Held-Karp tables need about 5 * n * 2**n bytes, roughly 460 MB at this limit
+HELD_KARP_MAX_POINTS = 22
+
+# The bidirectional search keeps about (n + 12) * 2**n bytes, roughly 600 MB at this limit
+BIDIRECTIONAL_MAX_POINTS = 24
+
+# Seconds between progress messages sent from a background search
+PROGRESS_INTERVAL = 0.1
+
+# Subtrees handed out per worker by the parallel search, more balances the load better
+PARALLEL_PREFIXES_PER_WORKER = 8
+
+# Default time budget in seconds for the local search
+LOCAL_SEARCH_TIME_LIMIT = 2.0
+
+# Largest boolean array built at once when checking steps against every point
+CHECK_CHUNK_ELEMENTS = 1 << 22
+
+# Bytes a branch and bound transposition table may grow to, and the entries it starts out with
+TRANSPOSITION_TABLE_BYTES = 64 * 1024 * 1024
+TRANSPOSITION_TABLE_INITIAL_ENTRIES = 1 << 12
+
+# Share of those bytes kept for the cache of MST lengths, and what one cached length costs as a dict
+# entry with its bitset key, so the cache and the transposition table together stay within the budget
+MST_CACHE_SHARE = 0.25
+MST_CACHE_ENTRY_BYTES = 176
+
+# Seed of the random Zobrist keys hashing branch and bound states, fixed so runs are repeatable
+ZOBRIST_SEED = 0x7599
+
+# Seconds of local improvement after each edit of an incremental search, and how many of the
+# cheapest gaps are checked for a clear insertion before one is repaired instead
+INCREMENTAL_IMPROVE_TIME = 0.005
+INSERTION_CANDIDATES = 16
+
+# Start and end points of generated instances, and the range the other points are drawn from
+DEFAULT_START = (550, 550)
+DEFAULT_END = (550, 50)
+POINT_RANGE = (100, 500)
+
+# Point layouts random_points can generate
+LAYOUTS = ("uniform", "clustered", "grid", "duplicates")
+
+# Binary instance files: a header of magic, version, start and end indices, point count, path length
+# and path distance padded to BINARY_HEADER_SIZE bytes, then the x coordinates, the y coordinates
+# and the path as little-endian int32 arrays. A path length of 0 means the file holds no path.
+BINARY_SUFFIX = ".tspp"
+BINARY_MAGIC = b"TSPPBIN\0"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<8sIiiqqq")
+BINARY_HEADER_SIZE = 64
+
+# Array elements or path segments written at a time when exporting
+EXPORT_CHUNK_SIZE = 1 << 16
+
+
+def iter_bits(mask):
+    """ Yield the indices of the set bits in mask, lowest first """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def path_array(path):
+    """ A path of point indices as a compact index array """
+    return np.asarray(path, dtype=np.int32)
+
+
+def manhattan_distance(point1, point2):
+    x1, y1 = point1
+    x2, y2 = point2
+    return abs(x1 - x2) + abs(y1 - y2)
+
+
+class SolverStats:
+    """ Counters and timings a solver fills in while it runs, passed to it as stats.
+
+    expanded counts search states expanded, or path steps for the greedy heuristics and applied moves
+    for the local search. memo_hits and memo_misses count lookups in a memo of states already reached,
+    evictions counts entries a full memo dropped to make room, shielded counts candidate steps the
+    shielding rule rejected, and pruned counts dropped states by cause. phases maps a phase name to
+    the seconds spent in it, peak_table_size is the most entries a solver table held at once and
+    table_capacity the most it had room for, when the table is capped. The exact solvers set
+    lower_bound to the best bound they proved on the optimal distance, and proven when the path they
+    return is optimal; a search stopped early by a time limit or cancel leaves proven False.
+
+    on_node is an optional hook called as on_node(last, remaining, cost) for every state expanded,
+    with the remaining points as a bitset. The local search calls it for every applied move with
+    remaining None and the new path length. It is meant for profiling and slows the solvers down.
+    Parallel searches cannot call it from their worker processes.
+    """
+
+    COUNTERS = ("expanded", "memo_hits", "memo_misses", "evictions", "shielded")
+
+    def __init__(self, on_node=None):
+        self.expanded = 0
+        self.memo_hits = 0
+        self.memo_misses = 0
+        self.evictions = 0
+        self.shielded = 0
+        self.pruned = {}
+        self.phases = {}
+        self.peak_table_size = 0
+        self.table_capacity = 0
+        self.lower_bound = None
+        self.proven = False
+        self.on_node = on_node
+
+    @property
+    def total_pruned(self):
+        return sum(self.pruned.values())
+
+    def prune(self, cause, count=1):
+        self.pruned[cause] = self.pruned.get(cause, 0) + count
+
+    @contextmanager
+    def phase(self, name):
+        """ Add the time spent in the with block to the named phase """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def bound(self, lower_bound, proven):
+        """ Record the lower bound a solver proved and whether its path is optimal """
+        self.lower_bound = lower_bound
+        self.proven = proven
+
+    def table_size(self, size, capacity=0):
+        if size > self.peak_table_size:
+            self.peak_table_size = size
+        if capacity > self.table_capacity:
+            self.table_capacity = capacity
+
+    def as_dict(self):
+        """ The stats as a plain dict that can be pickled or written as JSON """
+        stats = {name: getattr(self, name) for name in self.COUNTERS}
+        stats.update(pruned=dict(self.pruned), phases=dict(self.phases), peak_table_size=self.peak_table_size,
+                     table_capacity=self.table_capacity, lower_bound=self.lower_bound, proven=self.proven)
+        return stats
+
+    @classmethod
+    def from_dict(cls, stats):
+        merged = cls()
+        merged.merge(stats)
+        merged.bound(stats.get("lower_bound"), stats.get("proven", False))
+        return merged
+
+    def merge(self, stats):
+        """ Add in the stats of another run given as_dict(), such as a parallel worker's.
+
+        The bounds of separate runs do not add up, so lower_bound and proven are left to the caller.
+        """
+        # Stats written before a counter existed leave it out
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + stats.get(name, 0))
+        for cause, count in stats["pruned"].items():
+            self.prune(cause, count)
+        for name, seconds in stats["phases"].items():
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+        self.table_size(stats["peak_table_size"], stats.get("table_capacity", 0))
+
+    def summary(self):
+        """ One line of text for status displays """
+        parts = [f"Expanded: {self.expanded}"]
+        if self.memo_hits or self.memo_misses:
+            parts.append(f"Memo: {self.memo_hits} hits / {self.memo_misses} misses")
+        if self.evictions:
+            parts.append(f"Evicted: {self.evictions}")
+        parts.append(f"Shielded: {self.shielded}")
+        if self.pruned:
+            parts.append("Pruned: " + ", ".join(f"{cause} {count}" for cause, count in sorted(self.pruned.items())))
+        if self.lower_bound is not None and not self.proven:
+            parts.append(f"Lower bound: {self.lower_bound}")
+        if self.table_capacity:
+            parts.append(f"Table: {self.peak_table_size} / {self.table_capacity}")
+        elif self.peak_table_size:
+            parts.append(f"Table: {self.peak_table_size}")
+        if self.phases:
+            parts.append("Time: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.phases.items()))
+        return "  ".join(parts)
+
+
+class ShieldingIndex:
+    """ Per-instance index of which points shield each ordered pair of points.
+
+    Points are referred to by their index into the coordinate arrays. mask(i, j) is a bitset of the
+    points strictly inside the bounding box of i and j, so a step is valid when mask(i, j) & remaining
+    is 0. The masks from a point are built the first time they are needed, since all of them take
+    O(n**3) bits and an edited instance would pay for them again. distance is the full Manhattan
+    distance matrix, also built on first use.
+    """
+
+    def __init__(self, xs, ys):
+        self.xs = xs
+        self.ys = ys
+        self.size = len(xs)
+        self._distance = None
+        self.all_mask = (1 << self.size) - 1
+        self._rows = {}
+
+    @property
+    def distance(self):
+        if self._distance is None:
+            xs, ys = self.xs.astype(np.int64), self.ys.astype(np.int64)
+            self._distance = np.abs(xs[:, None] - xs[None, :]) + np.abs(ys[:, None] - ys[None, :])
+        return self._distance
+
+    def _build_row(self, i):
+        """ Compute the shielding masks from point i to every other point """
+        xs, ys = self.xs, self.ys
+        low_x, high_x = np.minimum(xs, xs[i])[:, None], np.maximum(xs, xs[i])[:, None]
+        low_y, high_y = np.minimum(ys, ys[i])[:, None], np.maximum(ys, ys[i])[:, None]
+        inside = (low_x < xs) & (xs < high_x) & (low_y < ys) & (ys < high_y)
+        packed = np.packbits(inside, axis=1, bitorder="little")
+        row = [int.from_bytes(packed[j].tobytes(), "little") for j in range(self.size)]
+        self._rows[i] = row
+        return row
+
+    def mask(self, i, j):
+        """ Bitset of the points strictly inside the bounding box of points i and j """
+        row = self._rows.get(i)
+        if row is None:
+            row = self._build_row(i)
+        return row[j]
+
+    def valid(self, i, j, remaining):
+        """ True when no point of the remaining bitset shields the step from i to j """
+        return not self.mask(i, j) & remaining
+
+
+class RangeTree:
+    """ Dynamic orthogonal range queries over a set of points, for shielding checks on large instances.
+
+    Holds the given point indices, and points are removed as a path visits them or added back. A
+    segment tree over the points in y order keeps in every node the sorted ranks in x order of its
+    held points. A box query bisects the O(log n) nodes covering its rows, O(log**2 n) in all, and an
+    update shifts one entry per level, against a pass over all points for a scan and O(n**3) bits
+    for the masks of a ShieldingIndex.
+    """
+
+    def __init__(self, xs, ys, points):
+        points = np.asarray(points, dtype=np.int64)
+        self.size = n = len(points)
+        self.x, self.y = xs.tolist(), ys.tolist()
+        # Columns are runs in x order and rows runs in y order, each sorted along the other axis
+        self.by_x = points[np.lexsort((points, ys[points], xs[points]))]
+        self.by_y = points[np.lexsort((points, xs[points], ys[points]))]
+        self.sorted_x, self.column_y = xs[self.by_x].tolist(), ys[self.by_x].tolist()
+        self.sorted_y, self.row_x = ys[self.by_y].tolist(), xs[self.by_y]
+        self.x_rank = dict(zip(self.by_x.tolist(), range(n)))
+        self.y_rank = dict(zip(self.by_y.tolist(), range(n)))
+        # Flags of the held points in x and y order, shared with numpy views to pick out whole runs
+        self.held_x, self.held_y = bytearray(b"\1" * n), bytearray(b"\1" * n)
+        self.held_x_view = np.frombuffer(self.held_x, dtype=bool) if n else np.zeros(0, dtype=bool)
+        self.held_y_view = np.frombuffer(self.held_y, dtype=bool) if n else np.zeros(0, dtype=bool)
+        self.nodes = [None] * n + [[self.x_rank[p]] for p in self.by_y.tolist()]
+        for i in range(n - 1, 0, -1):
+            self.nodes[i] = sorted(self.nodes[2 * i] + self.nodes[2 * i + 1])
+        self.held = n
+
+    def __len__(self):
+        return self.held
+
+    def remove(self, p):
+        """ Stop holding point p, which must be held """
+        r, i = self.x_rank[p], self.y_rank[p]
+        self.held_x[r] = self.held_y[i] = 0
+        i += self.size
+        while i:
+            node = self.nodes[i]
+            del node[bisect_left(node, r)]
+            i >>= 1
+        self.held -= 1
+
+    def add(self, p):
+        """ Hold point p again after it was removed """
+        r, i = self.x_rank[p], self.y_rank[p]
+        self.held_x[r] = self.held_y[i] = 1
+        i += self.size
+        while i:
+            insort(self.nodes[i], r)
+            i >>= 1
+        self.held += 1
+
+    def _covering(self, low_y, high_y):
+        """ The nodes covering the points with y in [low_y, high_y] """
+        nodes, n = self.nodes, self.size
+        first, last = bisect_left(self.sorted_y, low_y) + n, bisect_right(self.sorted_y, high_y) + n
+        covering = []
+        while first < last:
+            if first & 1:
+                covering.append(nodes[first])
+                first += 1
+            if last & 1:
+                last -= 1
+                covering.append(nodes[last])
+            first >>= 1
+            last >>= 1
+        return covering
+
+    def count(self, x1, y1, x2, y2):
+        """ Number of held points strictly inside the box with corners (x1, y1) and (x2, y2) """
+        first = bisect_right(self.sorted_x, min(x1, x2))
+        last = bisect_left(self.sorted_x, max(x1, x2))
+        if first >= last or abs(y1 - y2) < 2:
+            return 0
+        return sum(bisect_left(node, last) - bisect_left(node, first) for node in self._covering(min(y1, y2) + 1, max(y1, y2) - 1))
+
+    def valid(self, i, j):
+        """ True when no held point shields the step from point i to point j """
+        return not self.count(self.x[i], self.y[i], self.x[j], self.y[j])
+
+    def _held_run(self, held, first, last):
+        """ The offsets of the held flags in held[first:last], as a list if the run is short """
+        if last - first <= 8:
+            return [r for r in range(first, last) if held[r]]
+        view = self.held_x_view if held is self.held_x else self.held_y_view
+        return np.flatnonzero(view[first:last]) + first
+
+    def _staircase(self, bound, rightward, low_y, high_y, upward, runs):
+        """ Add the x ranks of the unshielded points of a quadrant to runs, one column at a time.
+
+        The quadrant is the columns past x rank bound and the rows low_y..high_y.
+        """
+        sorted_x, column_y = self.sorted_x, self.column_y
+        while low_y <= high_y:
+            # Rank of the nearest held point in the rows, in the column nearest to the corner
+            nearest = None
+            for node in self._covering(low_y, high_y):
+                if rightward:
+                    k = bisect_left(node, bound)
+                    if k < len(node) and (nearest is None or node[k] < nearest):
+                        nearest = node[k]
+                else:
+                    k = bisect_left(node, bound) - 1
+                    if k >= 0 and (nearest is None or node[k] > nearest):
+                        nearest = node[k]
+            if nearest is None:
+                return
+            x = sorted_x[nearest]
+            first, last = bisect_left(sorted_x, x), bisect_right(sorted_x, x)
+            column = self._held_run(self.held_x, bisect_left(column_y, low_y, first, last), bisect_right(column_y, high_y, first, last))
+            runs.append(column)
+            # Farther columns are shielded by this one past its nearest row
+            if upward:
+                high_y = column_y[column[0]]
+            else:
+                low_y = column_y[column[-1]]
+            bound = last if rightward else first
+
+    def unshielded(self, x, y):
+        """ The held points whose box with (x, y) has no other held point strictly inside, as an index array.
+
+        Points level with (x, y) in either coordinate are never shielded. In a quadrant around (x, y),
+        the nearest column of points is unshielded, and shields every point beyond it that is farther
+        along y than the column's nearest point. So the unshielded points form a staircase found one
+        column at a time by a query over the part of the quadrant nothing shields yet, which for
+        random points takes about log n columns rather than a pass over all points.
+        """
+        sorted_x, sorted_y = self.sorted_x, self.sorted_y
+        left, right = bisect_left(sorted_x, x), bisect_right(sorted_x, x)
+        # Points in the column of (x, y), then those in its row outside the column
+        runs = [np.zeros(0, dtype=np.int64)]
+        column = self._held_run(self.held_x, left, right)
+        if len(column):
+            runs.append(column)
+        row = np.asarray(self._held_run(self.held_y, bisect_left(sorted_y, y), bisect_right(sorted_y, y)), dtype=np.int64)
+        row = row[self.row_x[row] != x]
+        lowest, highest = int(np.iinfo(np.int32).min), int(np.iinfo(np.int32).max)
+        for upward in (True, False):
+            low_y, high_y = (y + 1, highest) if upward else (lowest, y - 1)
+            self._staircase(right, True, low_y, high_y, upward, runs)
+            self._staircase(left, False, low_y, high_y, upward, runs)
+        return np.concatenate((self.by_x[np.concatenate(runs)], self.by_y[row]))
+
+
+class Instance:
+    """ A TSPP instance: the point coordinates plus the indices of the fixed start and end points.
+
+    points is a sequence of (x, y) pairs or an (n, 2) array. The coordinates are kept as int32 arrays
+    xs and ys, so an instance takes 8 bytes per point and points are only ever referred to by index.
+    """
+
+    def __init__(self, points, start_index=0, end_index=1):
+        coords = np.asarray(points).reshape(-1, 2)
+        if coords.size and coords.dtype.kind not in "iu":
+            raise ValueError("Coordinates must be integers.")
+        if coords.size and (coords.min() < np.iinfo(np.int32).min or coords.max() > np.iinfo(np.int32).max):
+            raise ValueError("Coordinates must fit in 32-bit integers.")
+        self._set_coordinates(np.ascontiguousarray(coords[:, 0], dtype=np.int32),
+                              np.ascontiguousarray(coords[:, 1], dtype=np.int32), start_index, end_index)
+
+    @classmethod
+    def from_arrays(cls, xs, ys, start_index=0, end_index=1):
+        """ An instance over int32 coordinate arrays, used without copying, such as memory-mapped ones """
+        xs, ys = np.asarray(xs), np.asarray(ys)
+        if xs.dtype != np.int32 or ys.dtype != np.int32 or xs.shape != ys.shape or xs.ndim != 1:
+            raise ValueError("Coordinates must be two int32 arrays of the same length.")
+        instance = cls.__new__(cls)
+        instance._set_coordinates(np.ascontiguousarray(xs), np.ascontiguousarray(ys), start_index, end_index)
+        return instance
+
+    def _set_coordinates(self, xs, ys, start_index, end_index):
+        self.xs = xs
+        self.ys = ys
+        self.size = len(self.xs)
+        if start_index == end_index or not (0 <= start_index < self.size and 0 <= end_index < self.size):
+            raise ValueError("Start and end must be two different point indices.")
+        self.start_index = start_index
+        self.end_index = end_index
+        self.shielding = ShieldingIndex(self.xs, self.ys)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def coords(self):
+        """ The points as an (n, 2) int32 array """
+        return np.column_stack((self.xs, self.ys))
+
+    def point(self, i):
+        """ Coordinates of point i as a tuple of ints """
+        return int(self.xs[i]), int(self.ys[i])
+
+    @property
+    def start_point(self):
+        return self.point(self.start_index)
+
+    @property
+    def end_point(self):
+        return self.point(self.end_index)
+
+    @property
+    def interior(self):
+        """ Indices of the points that must be visited between start and end """
+        return [i for i in range(self.size) if i != self.start_index and i != self.end_index]
+
+    @property
+    def interior_mask(self):
+        """ Bitset of the interior points """
+        return self.shielding.all_mask & ~(1 << self.start_index) & ~(1 << self.end_index)
+
+    def valid_path(self, from_index, to_index, remaining):
+        """ Check if the connection from point from_index to point to_index is valid (not shielded by the remaining bitset) """
+        return self.shielding.valid(from_index, to_index, remaining)
+
+    def valid_route(self, path):
+        """ Check if path goes from start to end through every other point once with no step shielded.
+
+        The path is swept with a RangeTree of the points still to visit, so this takes O(n log**2 n)
+        rather than building shielding masks, and works for instances of any size.
+        """
+        path = np.asarray(path)
+        if len(path) != self.size or path[0] != self.start_index or path[-1] != self.end_index:
+            return False
+        if path.min() < 0 or path.max() >= self.size or np.bincount(path, minlength=self.size).max() != 1:
+            return False
+        remaining = RangeTree(self.xs, self.ys, self.interior)
+        path = path.tolist()
+        for a, b in zip(path[:-2], path[1:-1]):
+            remaining.remove(b)
+            if not remaining.valid(a, b):
+                return False
+        return True
+
+    def path_distance(self, path):
+        """ Total Manhattan length of a path of point indices """
+        xs, ys = self.xs[path].astype(np.int64), self.ys[path].astype(np.int64)
+        return int(np.abs(np.diff(xs)).sum() + np.abs(np.diff(ys)).sum())
+
+    def path_points(self, path):
+        """ Coordinates of a path of point indices as a list of (x, y) tuples """
+        return list(zip(self.xs[path].tolist(), self.ys[path].tolist()))
+
+
+def random_points(count, layout="uniform", seed=None):
+    """ count points as an (n, 2) int32 array, DEFAULT_START and DEFAULT_END first.
+
+    The other points fall in the POINT_RANGE square, laid out as
+    - uniform: independently and uniformly,
+    - clustered: normally around a few random centres,
+    - grid: on a lattice of spacing 25, so many share an x or y coordinate,
+    - duplicates: drawn from a pool of a quarter as many points, so many coincide.
+    The same seed always gives the same points, no seed gives fresh ones.
+    """
+    if count < 2:
+        raise ValueError("An instance needs at least the start and end points.")
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout!r}, expected one of {', '.join(LAYOUTS)}.")
+    rng = np.random.default_rng(seed)
+    low, high = POINT_RANGE
+    m = count - 2
+    if layout == "uniform":
+        inner = rng.integers(low, high + 1, size=(m, 2))
+    elif layout == "clustered":
+        centres = rng.integers(low, high + 1, size=(max(1, round(m ** 0.5 / 2)), 2))
+        spread = rng.normal(0, (high - low) / 16, size=(m, 2))
+        inner = np.clip(np.rint(centres[rng.integers(len(centres), size=m)] + spread), low, high)
+    elif layout == "grid":
+        inner = low + 25 * rng.integers(0, (high - low) // 25 + 1, size=(m, 2))
+    else:
+        pool = rng.integers(low, high + 1, size=(max(1, m // 4), 2))
+        inner = pool[rng.integers(len(pool), size=m)]
+    coords = np.empty((count, 2), dtype=np.int32)
+    coords[0], coords[1] = DEFAULT_START, DEFAULT_END
+    coords[2:] = inner
+    return coords
+
+
+def simple_path(instance, stats=None):
+    """ Simple path selection algorithm based on pairwise comparison of valid points.
+
+    Every pair of valid points scores its higher point by how far it is above the lowest remaining
+    point, and its lower point by how far it is right of the leftmost remaining point, and keeps the
+    smaller score. The first pair with the best score picks the next point. The first score is never
+    positive and the second never negative, so that choice has a closed form over the valid points
+    in index order, which is what is computed here rather than looping over the pairs. The valid
+    points are the staircases a RangeTree of the unvisited points finds, and the leftmost and
+    lowest points come from heaps, so a step costs polylog time per valid point rather than a pass
+    over all of them. Returns the path as point indices and its distance, or (None, inf) when it
+    gets stuck. Each step counts as a state expanded in stats, and candidates ruled out by shielding
+    as shielded.
+    """
+    stats = SolverStats() if stats is None else stats
+    x, y = instance.xs.tolist(), instance.ys.tolist()
+    ys = instance.ys.astype(np.int64)
+    interior = instance.interior
+    current_path = [instance.start_index]
+    unvisited = np.zeros(instance.size, dtype=bool)
+    unvisited[interior] = True
+    with stats.phase("index"):
+        tree = RangeTree(instance.xs, instance.ys, interior)
+    # Smallest x first and largest y first, visited points are dropped when they reach the top
+    leftmost = [(x[p], p) for p in interior]
+    lowest = [(-y[p], p) for p in interior]
+    heapq.heapify(leftmost)
+    heapq.heapify(lowest)
+    # The remaining bitset is only kept up for the on_node hook
+    remaining, cost = instance.interior_mask if stats.on_node is not None else 0, 0
+
+    with stats.phase("search"):
+        for left in range(len(interior), 0, -1):
+            last = current_path[-1]
+            while not unvisited[leftmost[0][1]]:
+                heapq.heappop(leftmost)
+            if left == 1:
+                # If only one point is left, move directly to that point
+                best_point = leftmost[0][1]
+            else:
+                while not unvisited[lowest[0][1]]:
+                    heapq.heappop(lowest)
+                leftmost_x, lowest_y = leftmost[0][0], -lowest[0][0]
+
+                valid_points = np.sort(tree.unshielded(x[last], y[last]))
+                stats.shielded += left - len(valid_points)
+                if len(valid_points) < 2:
+                    return None, float("inf")
+                valid_y = ys[valid_points]
+                highest_y = int(valid_y.min())
+                if highest_y < lowest_y:
+                    # The best pairs have a highest valid point as their higher point, the first such pair is
+                    # the first point with the second if both are highest, else the first point with the first highest one
+                    first_highest = int(np.argmax(valid_y == highest_y))
+                    if first_highest == 0 and valid_y[1] != highest_y:
+                        best_point = int(valid_points[0])
+                    else:
+                        best_point = int(valid_points[max(first_highest, 1)])
+                else:
+                    # All valid points are lowest, so every pair scores 0 and the first pair decides. Its higher
+                    # point is the second, unless the first is leftmost, which makes the lower point win the tie
+                    best_point = int(valid_points[0] if x[valid_points[0]] == leftmost_x else valid_points[1])
+
+            # Move to the best point
+            if stats.on_node is not None:
+                stats.on_node(last, remaining, cost)
+                remaining &= ~(1 << best_point)
+                cost += abs(x[last] - x[best_point]) + abs(y[last] - y[best_point])
+            stats.expanded += 1
+            current_path.append(best_point)
+            unvisited[best_point] = False
+            tree.remove(best_point)
+
+    # Finally, connect to the end point
+    current_path.append(instance.end_index)
+    current_path = path_array(current_path)
+    return current_path, instance.path_distance(current_path)
+
+
+class _SubsetSearch:
+    """ The setup held_karp_path and bidirectional_path share for n >= 1 interior points.
+
+    The interior points are renumbered 0..n-1: dist, dist_start and dist_end hold their distances and
+    shield[i, j] the renumbered mask of the points shielding the step from i to j. Costs are kept in
+    dtype with inf as the unreached cost, and first is the cost of the first step from the start
+    point to each of them, inf where shielded, which stats counts.
+    """
+
+    def __init__(self, instance, stats):
+        index = instance.shielding
+        start, end = instance.start_index, instance.end_index
+        self.stats = stats
+        self.interior = interior = instance.interior
+        self.n = n = len(interior)
+        inner = np.array(interior)
+        self.dist = index.distance[np.ix_(inner, inner)]
+        self.dist_start = index.distance[start, inner]
+        self.dist_end = index.distance[end, inner]
+        self.shield = np.array([[self._compact(index.mask(i, j)) for j in interior] for i in interior], dtype=np.int64)
+
+        # Distances fit in int32 unless the coordinates are very large
+        bound = int(self.dist.max(initial=0) + self.dist_start.max() + self.dist_end.max()) * (n + 1)
+        self.dtype = np.int32 if bound < np.iinfo(np.int32).max else np.int64
+        self.inf = np.iinfo(self.dtype).max
+        self.full = (1 << n) - 1
+
+        # The first step must clear every interior point
+        self.first = np.array([self.dist_start[j] if self._compact(index.mask(start, interior[j])) == 0 else self.inf
+                               for j in range(n)], dtype=self.dtype)
+        stats.shielded += int((self.first == self.inf).sum())
+
+    def _compact(self, mask):
+        """ Renumber a shielding mask onto bits 0..n-1 of the interior points """
+        return sum(1 << c for c, i in enumerate(self.interior) if mask >> i & 1)
+
+    def popcount(self):
+        """ How many points each of the 2**n subsets contains """
+        masks = np.arange(1 << self.n, dtype=np.int64)
+        popcount = np.zeros(1 << self.n, dtype=np.int8)
+        for b in range(self.n):
+            popcount += ((masks >> b) & 1).astype(np.int8)
+        return popcount
+
+    def report(self, j, subsets, subset_costs):
+        """ Report reached states ending at j to the on_node hook with instance bitsets """
+        interior = self.interior
+        for subset, subset_cost in zip(subsets.tolist(), subset_costs.tolist()):
+            remaining = sum(1 << interior[b] for b in iter_bits(self.full & ~subset))
+            self.stats.on_node(interior[j], remaining, subset_cost)
+
+
+def held_karp_path(instance, progress=None, cancel=None, stats=None):
+    """ Exact Held-Karp search over bitmask subsets of the points between start and end.
+
+    cost[j, S] is the shortest path from the start point through exactly the points in S ending at j.
+    Each subset-size layer is relaxed with NumPy over all subsets of that size at once. A step from
+    j to t is only allowed when no unvisited point lies strictly inside their bounding box, the same
+    shielding rule as valid_path. Memory is about 5 * n * 2**n bytes for n interior points.
+
+    progress is called with a stats dict after each layer. When the cancel event is set the search
+    stops and returns (None, inf). stats counts the reached states as expanded, unreachable ones and
+    relaxations that found nothing better as pruned, and steps blocked by shielding as shielded.
+    """
+    stats = SolverStats() if stats is None else stats
+    index = instance.shielding
+    start, end = instance.start_index, instance.end_index
+    interior = instance.interior
+    n = len(interior)
+    if n > HELD_KARP_MAX_POINTS:
+        raise ValueError(f"Optimal path is limited to {HELD_KARP_MAX_POINTS} points between start and end.")
+    if n == 0:
+        stats.bound(int(index.distance[start, end]), True)
+        return path_array([start, end]), int(index.distance[start, end])
+
+    with stats.phase("setup"):
+        points = _SubsetSearch(instance, stats)
+        dist, dist_end, shield = points.dist, points.dist_end, points.shield
+        dtype, inf, full = points.dtype, points.inf, points.full
+        cost = np.full((n, 1 << n), inf, dtype=dtype)
+        parent = np.full((n, 1 << n), -1, dtype=np.int8)
+        stats.table_size(cost.size)
+        cost[np.arange(n), 1 << np.arange(n)] = points.first
+
+        # Group the subsets by how many points they contain
+        popcount = points.popcount()
+        order = np.argsort(popcount, kind="stable")
+        layer_ends = np.cumsum(np.bincount(popcount, minlength=n + 1))
+
+    with stats.phase("search"):
+        for k in range(1, n):
+            layer = order[layer_ends[k - 1]:layer_ends[k]]
+            for j in range(n):
+                if cancel is not None and cancel.is_set():
+                    return None, float("inf")
+                subsets = layer[((layer >> j) & 1) == 1]
+                subset_costs = cost[j, subsets]
+                reached = subset_costs < inf
+                reached_count = int(reached.sum())
+                stats.expanded += reached_count
+                stats.prune("unreachable", int(reached.size) - reached_count)
+                subsets, subset_costs = subsets[reached], subset_costs[reached]
+                if subsets.size == 0:
+                    continue
+                if stats.on_node is not None:
+                    points.report(j, subsets, subset_costs)
+                unvisited = full & ~subsets
+                allowed_count = improved_count = 0
+                for t in range(n):
+                    allowed = (((unvisited >> t) & 1) == 1) & ((shield[j, t] & unvisited) == 0)
+                    next_subsets = subsets[allowed] | (1 << t)
+                    candidate = subset_costs[allowed] + dtype(dist[j, t])
+                    better = candidate < cost[t, next_subsets]
+                    next_subsets = next_subsets[better]
+                    cost[t, next_subsets] = candidate[better]
+                    parent[t, next_subsets] = j
+                    allowed_count += candidate.size
+                    improved_count += next_subsets.size
+                # Every subset in this layer has n - k unvisited points to step to
+                stats.shielded += subsets.size * (n - k) - allowed_count
+                stats.prune("dominated", allowed_count - improved_count)
+            if progress is not None:
+                progress({"expanded": stats.expanded, "pruned": stats.total_pruned, "best": float("inf"), "path": None,
+                          "stats": stats.as_dict()})
+
+    # Close the path to the end point and walk the parents back to the start
+    with stats.phase("backtrack"):
+        totals = np.where(cost[:, full] < inf, cost[:, full].astype(np.int64) + dist_end, np.iinfo(np.int64).max)
+        last = int(np.argmin(totals))
+        if cost[last, full] == inf:
+            return None, float("inf")
+        path = []
+        mask = full
+        while last != -1:
+            path.append(interior[last])
+            previous = int(parent[last, mask])
+            mask ^= 1 << last
+            last = previous
+    stats.bound(int(totals.min()), True)
+    return path_array([start] + path[::-1] + [end]), int(totals.min())
+
+
+def bidirectional_path(instance, progress=None, cancel=None, stats=None):
+    """ Exact meet-in-the-middle search growing Held-Karp layers from both fixed ends.
+
+    Paths grow forward from the start point through subsets of half the points between start and
+    end, and backward from the end point through subsets of the other half. Every forward state
+    (F, j) is then joined to the backward states over the complement of F. Shielding splits cleanly
+    between the halves. A forward step must clear every point not yet visited, as in held_karp_path.
+    A backward step only has to clear the points already on the backward half, since exactly those
+    come after it, and the joining step must clear the whole backward half.
+
+    Only subsets of up to half the points are stored, ranked within their size through a table of
+    4 * 2**n bytes, so parents take about n * 2**n bytes for n interior points against the
+    5 * n * 2**n of held_karp_path, and each half does about half the relaxations. progress, cancel
+    and stats work as for held_karp_path. The on_node hook sees backward states with their first
+    point as last and the points off the partial path as remaining.
+    """
+    stats = SolverStats() if stats is None else stats
+    start, end = instance.start_index, instance.end_index
+    interior = instance.interior
+    n = len(interior)
+    if n > BIDIRECTIONAL_MAX_POINTS:
+        raise ValueError(f"The bidirectional search is limited to {BIDIRECTIONAL_MAX_POINTS} points between start and end.")
+    if n < 2:
+        return held_karp_path(instance, progress, cancel, stats)
+
+    with stats.phase("setup"):
+        points = _SubsetSearch(instance, stats)
+        dist, shield = points.dist, points.shield
+        dtype, inf, full = points.dtype, points.inf, points.full
+
+        # layers[k] lists the subsets of k points in increasing order, and rank maps a subset to its place there
+        forward_size, backward_size = (n + 1) // 2, n // 2
+        popcount = points.popcount()
+        layers = [np.flatnonzero(popcount == k) for k in range(forward_size + 1)]
+        del popcount
+        rank = np.zeros(1 << n, dtype=np.int32)
+        for layer in layers:
+            rank[layer] = np.arange(len(layer), dtype=np.int32)
+
+        # The first backward step, into the end point, clears nothing
+        backward_first = points.dist_end.astype(dtype)
+
+    def grow(first, size, forward, wanted=None):
+        """ Relax the layers of one half, returns the costs of its last layer and the parents of every layer,
+        or None if cancelled. A forward state (S, j) ends at j having visited S, a backward one starts at j
+        and visits S before the end point. wanted[k] marks the subsets of layer k worth reaching, by rank. """
+        # The subsets of one point are ranked by that point
+        cost = np.full((n, n), inf, dtype=dtype)
+        cost[np.arange(n), np.arange(n)] = first
+        parents = [np.full((n, n), -1, dtype=np.int8)]
+        for k in range(1, size):
+            layer = layers[k]
+            next_cost = np.full((n, len(layers[k + 1])), inf, dtype=dtype)
+            parent = np.full(next_cost.shape, -1, dtype=np.int8)
+            for j in range(n):
+                if cancel is not None and cancel.is_set():
+                    return None
+                columns = np.flatnonzero(cost[j] < inf)
+                stats.expanded += columns.size
+                stats.prune("unreachable", math.comb(n - 1, k - 1) - columns.size)
+                if columns.size == 0:
+                    continue
+                subsets, subset_costs = layer[columns], cost[j, columns]
+                if stats.on_node is not None:
+                    points.report(j, subsets, subset_costs)
+                unvisited = full & ~subsets
+                allowed_count = unmatched_count = improved_count = 0
+                for t in range(n):
+                    if forward:
+                        allowed = (((unvisited >> t) & 1) == 1) & ((shield[j, t] & unvisited) == 0)
+                    else:
+                        allowed = (((unvisited >> t) & 1) == 1) & ((shield[t, j] & subsets) == 0)
+                    sources = np.flatnonzero(allowed)
+                    next_columns = rank[subsets[sources] | (1 << t)]
+                    allowed_count += sources.size
+                    if wanted is not None:
+                        keep = wanted[k + 1][next_columns]
+                        sources, next_columns = sources[keep], next_columns[keep]
+                        unmatched_count += int(keep.size) - sources.size
+                    candidate = subset_costs[sources] + dtype(dist[j, t])
+                    better = candidate < next_cost[t, next_columns]
+                    next_columns = next_columns[better]
+                    next_cost[t, next_columns] = candidate[better]
+                    parent[t, next_columns] = j
+                    improved_count += next_columns.size
+                # Every subset in this layer has n - k points left to add
+                stats.shielded += columns.size * (n - k) - allowed_count
+                stats.prune("unmatched", unmatched_count)
+                stats.prune("dominated", allowed_count - unmatched_count - improved_count)
+            parents.append(parent)
+            cost = next_cost
+            if progress is not None:
+                progress({"expanded": stats.expanded, "pruned": stats.total_pruned, "best": float("inf"), "path": None,
+                          "stats": stats.as_dict()})
+        return cost, parents
+
+    with stats.phase("forward"):
+        forward = grow(points.first, forward_size, True)
+    if forward is None:
+        return None, float("inf")
+    with stats.phase("backward"):
+        # A backward half is only worth growing if it fits in the points some forward half left out
+        wanted = [None] * (backward_size + 1)
+        reached = (forward[0] < inf).any(axis=0)
+        wanted[backward_size] = np.zeros(len(layers[backward_size]), dtype=bool)
+        wanted[backward_size][rank[full & ~layers[forward_size][reached]]] = True
+        for k in range(backward_size, 1, -1):
+            wanted[k - 1] = np.zeros(len(layers[k - 1]), dtype=bool)
+            supersets = layers[k][wanted[k]]
+            for b in range(n):
+                has = ((supersets >> b) & 1) == 1
+                wanted[k - 1][rank[supersets[has] ^ (1 << b)]] = True
+        backward_first = np.where(wanted[1], backward_first, inf).astype(dtype)
+        backward = grow(backward_first, backward_size, False, wanted)
+    if backward is None:
+        return None, float("inf")
+    (forward_cost, forward_parents), (backward_cost, backward_parents) = forward, backward
+    stats.table_size(sum(parent.size for parent in forward_parents + backward_parents) + forward_cost.size + backward_cost.size)
+
+    # Join each forward state to a backward state over the points it has not visited
+    with stats.phase("join"):
+        best, best_state = np.iinfo(np.int64).max, None
+        for j in range(n):
+            columns = np.flatnonzero(forward_cost[j] < inf)
+            subsets = layers[forward_size][columns]
+            complements = full & ~subsets
+            back_columns = rank[complements]
+            subset_costs = forward_cost[j, columns].astype(np.int64)
+            for h in range(n):
+                allowed = (((complements >> h) & 1) == 1) & ((shield[j, h] & complements) == 0)
+                stats.shielded += int(((complements >> h) & 1).sum()) - int(allowed.sum())
+                back_costs = backward_cost[h, back_columns[allowed]]
+                reached = back_costs < inf
+                totals = subset_costs[allowed][reached] + int(dist[j, h]) + back_costs[reached].astype(np.int64)
+                if totals.size == 0:
+                    continue
+                i = int(np.argmin(totals))
+                if totals[i] < best:
+                    best = int(totals[i])
+                    best_state = (j, int(subsets[allowed][reached][i]), h, int(complements[allowed][reached][i]))
+        if best_state is None:
+            return None, float("inf")
+
+    # Walk the parents of both halves back to their end points
+    with stats.phase("backtrack"):
+        halves = []
+        for last, subset, size, parents in ((best_state[0], best_state[1], forward_size, forward_parents),
+                                            (best_state[2], best_state[3], backward_size, backward_parents)):
+            half = []
+            while last != -1:
+                half.append(interior[last])
+                previous = int(parents[size - 1][last, rank[subset]])
+                subset ^= 1 << last
+                last = previous
+                size -= 1
+            halves.append(half)
+    stats.bound(best, True)
+    return path_array([start] + halves[0][::-1] + halves[1] + [end]), best
+
+
+def nearest_neighbor_path(instance, stats=None):
+    """ Greedy path that always steps to the closest remaining point.
+
+    A point strictly inside the box of a step would be closer than the step's target, so the closest
+    remaining point is never shielded and this path is always valid. Each step counts as a state
+    expanded in stats.
+    """
+    stats = SolverStats() if stats is None else stats
+    xs, ys = instance.xs.astype(np.int64), instance.ys.astype(np.int64)
+    unvisited = np.ones(instance.size, dtype=bool)
+    unvisited[[instance.start_index, instance.end_index]] = False
+    current_path = [instance.start_index]
+    # The remaining bitset is only kept up for the on_node hook
+    remaining, cost = instance.interior_mask if stats.on_node is not None else 0, 0
+    with stats.phase("search"):
+        for _ in range(int(unvisited.sum())):
+            current = current_path[-1]
+            distance = np.abs(xs - xs[current]) + np.abs(ys - ys[current])
+            best_point = int(np.argmin(np.where(unvisited, distance, np.iinfo(np.int64).max)))
+            if stats.on_node is not None:
+                stats.on_node(current, remaining, cost)
+                remaining &= ~(1 << best_point)
+                cost += int(distance[best_point])
+            stats.expanded += 1
+            current_path.append(best_point)
+            unvisited[best_point] = False
+    current_path.append(instance.end_index)
+    current_path = path_array(current_path)
+    return current_path, instance.path_distance(current_path)
+
+
+class TranspositionTable:
+    """ The cheapest cost each search state was reached at, in at most max_bytes of memory.
+
+    States are given as nonzero 64-bit hash keys, such as Zobrist hashes of the last point and the
+    remaining bitset, and entries are kept in flat arrays at ENTRY_BYTES each instead of a dict of
+    big-int tuples. A key goes in the first free slot of the PROBES slots from its home slot. The
+    table starts small and doubles whenever it is three quarters full or a key finds no free slot,
+    as long as the old and the doubled arrays fit in max_bytes together while it is rehashed. Once it
+    cannot grow, a new key takes the slot of the entry with the fewest points left to visit, since
+    that entry prunes the smallest subtree. Evicting an entry only means a state may be searched
+    again, so the search stays exact. Two states sharing a 64-bit key would be a false hit, which is
+    about as likely as entries / 2**64 per lookup.
+
+    Lookups are counted in stats as memo hits and misses, and overwritten entries as evictions.
+    """
+
+    # Key, cost and remaining point count
+    ENTRY_BYTES = 8 + 8 + 2
+
+    # Slots a key may be stored in, from its home slot on
+    PROBES = 8
+
+    def __init__(self, max_bytes=TRANSPOSITION_TABLE_BYTES, stats=None):
+        self.stats = SolverStats() if stats is None else stats
+        self.max_capacity = self.PROBES
+        # Growing holds the old arrays and the doubled ones at once, which must fit in max_bytes too
+        while self.max_capacity * 3 * self.ENTRY_BYTES <= max_bytes:
+            self.max_capacity *= 2
+        self.size = 0
+        self._allocate(min(TRANSPOSITION_TABLE_INITIAL_ENTRIES, self.max_capacity))
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def occupancy(self):
+        """ Fraction of the slots in use """
+        return self.size / self.capacity
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self._mask = capacity - 1
+        self._keys = array.array("Q", [0]) * capacity
+        self._costs = array.array("q", [0]) * capacity
+        self._depths = array.array("H", [0]) * capacity
+
+    def _find(self, key):
+        """ The slot holding key or the free slot it goes in, None if its slots are all taken """
+        keys, mask = self._keys, self._mask
+        home = key & mask
+        for i in range(self.PROBES):
+            slot = (home + i) & mask
+            held = keys[slot]
+            if held == key or not held:
+                return slot
+        return None
+
+    def _victim(self, key):
+        """ The slot among key's slots whose entry has the fewest points left to visit """
+        mask = self._mask
+        home = key & mask
+        return min(((home + i) & mask for i in range(self.PROBES)), key=self._depths.__getitem__)
+
+    def _store(self, slot, key, cost, depth):
+        if slot is None:
+            slot = self._victim(key)
+            self.stats.evictions += 1
+        else:
+            self.size += 1
+        self._keys[slot], self._costs[slot], self._depths[slot] = key, cost, depth
+
+    def _grow(self):
+        keys, costs, depths = self._keys, self._costs, self._depths
+        self._allocate(self.capacity * 2)
+        self.size = 0
+        for slot, key in enumerate(keys):
+            if key:
+                self._store(self._find(key), key, costs[slot], depths[slot])
+
+    def record(self, key, cost, depth):
+        """ Note that the state with this key was reached at cost with depth points left to visit.
+
+        Returns False when the state was reached before at no greater cost, so it can be pruned.
+        """
+        slot = key & self._mask
+        held = self._keys[slot]
+        if held and held != key:
+            slot = self._find(key)
+        if slot is not None and self._keys[slot] == key:
+            self.stats.memo_hits += 1
+            if self._costs[slot] <= cost:
+                return False
+            self._costs[slot] = cost
+            return True
+        self.stats.memo_misses += 1
+        # Grow rather than evict while there is memory left
+        while self.capacity < self.max_capacity and (slot is None or self.size * 4 >= self.capacity * 3):
+            self._grow()
+            slot = self._find(key)
+        self._store(slot, key, cost, min(depth, 0xFFFF))
+        return True
+
+
+class BranchAndBound:
+    """ Depth-first branch and bound with admissible rectilinear lower bounds.
+
+    The incumbent is seeded from simple_path and nearest_neighbor_path. A partial path ending at point
+    last with the bitset remaining still to visit costs at least the larger of
+    - the MST of remaining plus the end point, plus the cheapest edge from last into remaining, and
+    - the half perimeter of the bounding box of last, remaining and the end point,
+    since any rectilinear path through those points spans both. Children are searched cheapest bound
+    first and a (last, remaining) state is dropped when it was reached before at no greater cost.
+
+    lower_bound is the best lower bound proved so far, the smallest bound still open when it was last
+    checked, so gap = incumbent - lower_bound is how far the search is from proving optimality. It
+    equals the incumbent and proven is set once the search finishes. Both go into the snapshots and
+    into stats. progress is called with
+    snapshot() every CHECK_SECONDS, whenever the incumbent improves and when the search is exhausted,
+    and setting the cancel event stops the search early like the time limit does.
+
+    When several searches run in parallel they share shared_incumbent, a multiprocessing.Value holding
+    the best distance any of them has found, and prune against it. A search that picks up a better
+    distance from elsewhere drops its own path, so only the search that found the best path returns it.
+
+    The (last, remaining) memo is a TranspositionTable keyed by Zobrist hashes updated as points are
+    visited. It shares table_bytes with the cache of MST lengths by bitset, which gets MST_CACHE_SHARE
+    of them and drops its oldest length when full. stats counts its hits, misses and evictions, and prunes a state as
+    "bound" when its bound cannot beat the incumbent, "stale" when the incumbent improved while it
+    waited on the stack and "dominated" when the memo holds it at no greater cost.
+    """
+
+    # Seconds between cancel, time limit and progress checks, the clock itself is read every step
+    CHECK_SECONDS = 0.02
+
+    # How many steps go by between reads of the shared incumbent
+    SYNC_INTERVAL = 64
+
+    def __init__(self, instance, time_limit=None, progress=None, cancel=None, shared_incumbent=None, seed=True, stats=None,
+                 table_bytes=TRANSPOSITION_TABLE_BYTES):
+        self.instance = instance
+        self.time_limit = time_limit
+        self.progress = progress
+        self.cancel = cancel
+        self.shared_incumbent = shared_incumbent
+        self.seed = seed
+        self.distance = instance.shielding.distance
+        self.rows = self.distance.tolist()
+        self.xs = instance.xs
+        self.ys = instance.ys
+        self.incumbent_path = None
+        self.incumbent = float("inf")
+        self.lower_bound = 0
+        self.stats = SolverStats() if stats is None else stats
+        self.proven = False
+        self._mst_cache = OrderedDict()
+        mst_cache_bytes = int(table_bytes * MST_CACHE_SHARE)
+        self._mst_cache_entries = max(1, mst_cache_bytes // MST_CACHE_ENTRY_BYTES)
+        self.table = TranspositionTable(table_bytes - mst_cache_bytes, self.stats)
+        # Zobrist keys: a state's hash is the XOR of the remaining keys of its unvisited points and the last key of its last point
+        keys = np.random.default_rng(ZOBRIST_SEED).integers(0, 2**64, size=(2, instance.size), dtype=np.uint64, endpoint=False)
+        self._remaining_keys, self._last_keys = keys[0].tolist(), keys[1].tolist()
+
+    @property
+    def expanded(self):
+        return self.stats.expanded
+
+    @property
+    def pruned(self):
+        return self.stats.total_pruned
+
+    @property
+    def gap(self):
+        """ Distance between the incumbent and the best open lower bound """
+        return self.incumbent - self.lower_bound
+
+    def snapshot(self):
+        """ Progress stats: states expanded, states pruned, best distance and path so far, the lower bound,
+        gap and whether the best path is proven optimal, and all the stats
+        """
+        self.stats.table_size(len(self.table), self.table.capacity)
+        self.stats.bound(self.lower_bound, self.proven)
+        return {"expanded": self.expanded, "pruned": self.pruned, "best": self.incumbent, "path": self.incumbent_path,
+                "lower_bound": self.lower_bound, "gap": self.gap, "proven": self.proven, "stats": self.stats.as_dict()}
+
+    def _open_bound(self, stack):
+        """ Raise lower_bound to the smallest bound on the stack, any earlier bound stays valid too """
+        if stack:
+            self.lower_bound = max(self.lower_bound, min(self.incumbent, min(entry[0] for entry in stack)))
+        else:
+            self.lower_bound = max(self.lower_bound, self.incumbent)
+
+    def _mst_length(self, remaining):
+        """ Length of the minimum spanning tree over the remaining points and the end point """
+        length = self._mst_cache.get(remaining)
+        if length is None:
+            members = list(iter_bits(remaining)) + [self.instance.end_index]
+            sub = self.distance[np.ix_(members, members)]
+            in_tree = np.zeros(len(members), dtype=bool)
+            in_tree[0] = True
+            closest = sub[0].copy()
+            length = 0
+            for _ in range(len(members) - 1):
+                j = int(np.argmin(np.where(in_tree, np.iinfo(np.int64).max, closest)))
+                length += int(closest[j])
+                in_tree[j] = True
+                np.minimum(closest, sub[j], out=closest)
+            if len(self._mst_cache) >= self._mst_cache_entries:
+                self._mst_cache.popitem(last=False)
+            self._mst_cache[remaining] = length
+        return length
+
+    def bound(self, last, remaining):
+        """ Admissible lower bound on the cost from last through every remaining point to the end """
+        end = self.instance.end_index
+        if not remaining:
+            return self.rows[last][end]
+        members = list(iter_bits(remaining))
+        row = self.rows[last]
+        tree = self._mst_length(remaining) + min(row[p] for p in members)
+        members += [last, end]
+        xs, ys = self.xs[members], self.ys[members]
+        box = int(xs.max()) - int(xs.min()) + int(ys.max()) - int(ys.min())
+        return max(tree, box)
+
+    def _seed(self):
+        with self.stats.phase("seed"):
+            for heuristic in (simple_path, nearest_neighbor_path):
+                path, distance = heuristic(self.instance)
+                if path is not None and distance < self.incumbent:
+                    self.incumbent_path, self.incumbent = path, distance
+
+    def _sync_incumbent(self):
+        """ Pick up a better distance found by another search """
+        shared = self.shared_incumbent.value
+        if shared < self.incumbent:
+            self.incumbent, self.incumbent_path = shared, None
+
+    def _share_incumbent(self):
+        """ Publish this search's incumbent to the others """
+        with self.shared_incumbent.get_lock():
+            if self.incumbent < self.shared_incumbent.value:
+                self.shared_incumbent.value = self.incumbent
+
+    def solve(self, prefix=None):
+        """ Run the search and return (path, distance) of the best path found.
+
+        prefix is a path of point indices from the start point, when given only its completions are searched.
+        """
+        instance = self.instance
+        start, end = instance.start_index, instance.end_index
+        rows = self.rows
+        deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        if self.seed:
+            self._seed()
+        if self.shared_incumbent is not None:
+            self._sync_incumbent()
+
+        # Stack entries are (bound, cost so far, last point, remaining bitset, parent entry, Zobrist hash of remaining)
+        node, cost, remaining = None, 0, instance.interior_mask
+        for p in prefix or [start]:
+            if node is not None:
+                cost += rows[node[2]][p]
+            remaining &= ~(1 << p)
+            node = (0, cost, p, remaining, node)
+        remaining_keys, last_keys = self._remaining_keys, self._last_keys
+        remaining_hash = 0
+        for p in iter_bits(remaining):
+            remaining_hash ^= remaining_keys[p]
+        stack = [(cost + self.bound(node[2], remaining),) + node[1:] + (remaining_hash,)]
+        self._open_bound(stack)
+        if self.progress is not None:
+            self.progress(self.snapshot())
+        stats, table, on_node = self.stats, self.table, self.stats.on_node
+        pruned = stats.pruned
+        for cause in ("bound", "stale", "dominated"):
+            pruned.setdefault(cause, 0)
+        with stats.phase("search"):
+            steps = 0
+            next_check = time.perf_counter() + self.CHECK_SECONDS
+            while stack:
+                steps += 1
+                if self.shared_incumbent is not None and steps % self.SYNC_INTERVAL == 0:
+                    self._sync_incumbent()
+                now = time.perf_counter()
+                if now >= next_check:
+                    next_check = now + self.CHECK_SECONDS
+                    self._open_bound(stack)
+                    if self.progress is not None:
+                        self.progress(self.snapshot())
+                    cancelled = self.cancel is not None and self.cancel.is_set()
+                    if cancelled or (deadline is not None and now > deadline):
+                        stats.table_size(len(table), table.capacity)
+                        stats.bound(self.lower_bound, self.proven)
+                        return self.incumbent_path, self.incumbent
+                node = stack.pop()
+                node_bound, cost, last, remaining, _, remaining_hash = node
+                if node_bound >= self.incumbent:
+                    pruned["stale"] += 1
+                    continue
+                stats.expanded += 1
+                if on_node is not None:
+                    on_node(last, remaining, cost)
+
+                if not remaining:
+                    total = cost + rows[last][end]
+                    if total < self.incumbent:
+                        path = [end]
+                        while node is not None:
+                            path.append(node[2])
+                            node = node[4]
+                        self.incumbent_path, self.incumbent = path_array(path[::-1]), total
+                        if self.shared_incumbent is not None:
+                            self._share_incumbent()
+                        if self.progress is not None:
+                            self.progress(self.snapshot())
+                    continue
+
+                children = []
+                depth = bin(remaining).count("1") - 1
+                for p in iter_bits(remaining):
+                    if not instance.valid_path(last, p, remaining):
+                        stats.shielded += 1
+                        continue
+                    child_cost = cost + rows[last][p]
+                    child_remaining = remaining & ~(1 << p)
+                    child_hash = remaining_hash ^ remaining_keys[p]
+                    if not table.record((child_hash ^ last_keys[p]) or 1, child_cost, depth):
+                        pruned["dominated"] += 1
+                        continue
+                    child_bound = child_cost + self.bound(p, child_remaining)
+                    if child_bound >= self.incumbent:
+                        pruned["bound"] += 1
+                        continue
+                    children.append((child_bound, child_cost, p, child_remaining, node, child_hash))
+
+                # Push the most expensive first so the cheapest bound is explored next
+                children.sort(key=lambda entry: entry[0], reverse=True)
+                stack.extend(children)
+
+        self.lower_bound = self.incumbent
+        self.proven = True
+        stats.table_size(len(table), table.capacity)
+        stats.bound(self.lower_bound, self.proven)
+        if self.progress is not None:
+            self.progress(self.snapshot())
+        return self.incumbent_path, self.incumbent
+
+
+def branch_and_bound_path(instance, time_limit=None, progress=None, cancel=None, stats=None, table_bytes=TRANSPOSITION_TABLE_BYTES):
+    """ Exact branch and bound search, returns (path, distance) like the other solvers """
+    path, distance = BranchAndBound(instance, time_limit, progress, cancel, stats=stats, table_bytes=table_bytes).solve()
+    if path is None:
+        return None, float("inf")
+    return path, distance
+
+
+def nearest_neighbor_lists(xs, ys, count):
+    """ Indices of the count closest points in L1 to every point, closest first """
+    n = len(xs)
+    count = min(count, n - 1)
+    neighbors = np.empty((n, max(count, 0)), dtype=np.int64)
+    if count <= 0:
+        return neighbors
+    rows = max(1, CHECK_CHUNK_ELEMENTS // n)
+    for lo in range(0, n, rows):
+        hi = min(n, lo + rows)
+        distance = np.abs(xs[lo:hi, None].astype(np.int64) - xs) + np.abs(ys[lo:hi, None].astype(np.int64) - ys)
+        distance[np.arange(hi - lo), np.arange(lo, hi)] = np.iinfo(np.int64).max
+        closest = np.argpartition(distance, count - 1, axis=1)[:, :count]
+        order = np.take_along_axis(distance, closest, axis=1).argsort(axis=1, kind="stable")
+        neighbors[lo:hi] = np.take_along_axis(closest, order, axis=1)
+    return neighbors
+
+
+class LocalSearch:
+    """ Anytime improvement of a valid path with 2-opt and Or-opt moves under the shielding rule.
+
+    A 2-opt move reverses the segment between two points so they become adjacent. An Or-opt move
+    shifts a segment of up to OR_OPT_MAX_SEGMENT points, possibly reversed, next to a point elsewhere.
+    Moves are only tried towards points on each other's neighbor lists and are priced from the few
+    steps they replace. An improving move is applied only if no point visited after an affected step
+    lies strictly inside that step's box, so the path stays valid. That needs a valid path to start
+    from, so a given path is checked with Instance.valid_route and raises ValueError if it is not.
+
+    At a local optimum a random feasible segment reversal kicks the search on, and the best path seen
+    is kept until time_limit runs out. The time limit counts from construction, so building the start
+    path and the neighbor lists comes out of it, and when those alone take longer the start path is
+    returned as it is. moves counts applied moves and rejected the improving moves that shielding
+    ruled out, improve() adds them to stats as expanded and shielded.
+    """
+
+    NEIGHBORS = 8
+    OR_OPT_MAX_SEGMENT = 3
+
+    # Longest segment a 2-opt move may reverse, every reversed step has to be rechecked for shielding
+    TWO_OPT_MAX_SEGMENT = 1000
+
+    # Longest segment reversed by a kick, and how many random kicks are tried before giving up
+    KICK_MAX_SEGMENT = 30
+    KICK_ATTEMPTS = 100
+
+    def __init__(self, instance, path=None, time_limit=LOCAL_SEARCH_TIME_LIMIT, seed=0, stats=None):
+        self._started = time.perf_counter()
+        self.instance = instance
+        self.time_limit = time_limit
+        self.stats = SolverStats() if stats is None else stats
+        self.random = random.Random(seed)
+        self.xs, self.ys = instance.xs, instance.ys
+        self.x, self.y = self.xs.tolist(), self.ys.tolist()
+        if path is None:
+            path, _ = nearest_neighbor_path(instance)
+        elif not instance.valid_route(path):
+            raise ValueError("The path to improve is not a valid path of the instance.")
+        self.path = np.asarray(path).tolist()
+        self.last = len(self.path) - 1
+        self.pos = np.empty(len(self.path), dtype=np.int64)
+        self.pos[self.path] = np.arange(len(self.path))
+        self.length = instance.path_distance(self.path)
+        with self.stats.phase("neighbors"):
+            self.neighbors = nearest_neighbor_lists(self.xs, self.ys, self.NEIGHBORS).tolist()
+        self.best_path, self.best_length = list(self.path), self.length
+        self.moves = 0
+        self.rejected = 0
+        self._queue = deque()
+        self._queued = np.zeros(len(self.path), dtype=bool)
+
+    def _d(self, a, b):
+        return abs(self.x[a] - self.x[b]) + abs(self.y[a] - self.y[b])
+
+    def _steps_clear(self, sources, targets, pos):
+        """ True when no point visited after a step lies strictly inside its box.
+
+        Step e goes from sources[e] to targets[e], and pos is the visiting position of every point in
+        the path being checked.
+        """
+        xs, ys = self.xs, self.ys
+        sources, targets = np.asarray(sources), np.asarray(targets)
+        low_x, high_x = np.minimum(xs[sources], xs[targets])[:, None], np.maximum(xs[sources], xs[targets])[:, None]
+        low_y, high_y = np.minimum(ys[sources], ys[targets])[:, None], np.maximum(ys[sources], ys[targets])[:, None]
+        after = pos[targets][:, None]
+
+        # Only points later than the earliest step and inside the union of the boxes can shield anything
+        candidates = np.flatnonzero(
+            (pos > after.min()) & (pos < self.last)
+            & (low_x.min() < xs) & (xs < high_x.max()) & (low_y.min() < ys) & (ys < high_y.max())
+        )
+        if candidates.size == 0:
+            return True
+        cx, cy, cpos = xs[candidates], ys[candidates], pos[candidates]
+        rows = max(1, CHECK_CHUNK_ELEMENTS // candidates.size)
+        for lo in range(0, len(sources), rows):
+            hi = lo + rows
+            inside = (low_x[lo:hi] < cx) & (cx < high_x[lo:hi]) & (low_y[lo:hi] < cy) & (cy < high_y[lo:hi])
+            if (inside & (cpos > after[lo:hi])).any():
+                return False
+        return True
+
+    def _steps_avoid(self, sources, targets, points):
+        """ True when none of points lies strictly inside the box of any step """
+        xs, ys = self.xs, self.ys
+        sources, targets, points = np.asarray(sources), np.asarray(targets), np.asarray(points)
+        px, py = xs[points], ys[points]
+        low_x, high_x = np.minimum(xs[sources], xs[targets])[:, None], np.maximum(xs[sources], xs[targets])[:, None]
+        low_y, high_y = np.minimum(ys[sources], ys[targets])[:, None], np.maximum(ys[sources], ys[targets])[:, None]
+        return not ((low_x < px) & (px < high_x) & (low_y < py) & (py < high_y)).any()
+
+    def _touch(self, points):
+        """ Queue points whose surroundings changed so moves around them are tried again """
+        for p in points:
+            if not self._queued[p]:
+                self._queued[p] = True
+                self._queue.append(p)
+
+    def _apply_two_opt(self, i, j, delta):
+        """ Reverse path[i + 1..j] unless that shields one of its steps """
+        path = self.path
+        segment = path[i + 1:j + 1][::-1]
+        pos = self.pos.copy()
+        pos[segment] = np.arange(i + 1, j + 1)
+        steps = [path[i]] + segment + [path[j + 1]]
+        # The two new steps are the likeliest to be shielded, so check them before the reversed ones
+        ends = [0, len(steps) - 2]
+        if not (self._steps_clear([steps[t] for t in ends], [steps[t + 1] for t in ends], pos)
+                and self._steps_clear(steps[1:-2], steps[2:-1], pos)):
+            self.rejected += 1
+            return False
+        if self.stats.on_node is not None:
+            self.stats.on_node(path[i], None, self.length + delta)
+        path[i + 1:j + 1] = segment
+        self.pos = pos
+        self.length += delta
+        self.moves += 1
+        self._touch([path[i], path[i + 1], path[j], path[j + 1]])
+        return True
+
+    def _try_two_opt(self, u):
+        path, d = self.path, self._d
+        pu = int(self.pos[u])
+        for v in self.neighbors[u]:
+            pv = int(self.pos[v])
+            i, j = min(pu, pv), max(pu, pv)
+            if j - i < 2 or j >= self.last or j - i > self.TWO_OPT_MAX_SEGMENT:
+                continue
+            a, b, c, e = path[i], path[i + 1], path[j], path[j + 1]
+            delta = d(a, c) + d(b, e) - d(a, b) - d(c, e)
+            if delta < 0 and self._apply_two_opt(i, j, delta):
+                return True
+        return False
+
+    def _apply_or_opt(self, s, e, k, segment, delta):
+        """ Move path[s..e] between path[k] and path[k + 1] as segment unless that shields a step """
+        path = self.path
+        if k < s:
+            lo, hi = k, e + 1
+            window = [path[k]] + segment + path[k + 1:s] + [path[e + 1]]
+            # New steps around the segment and the one closing its old place, the steps in between
+            # only lost the segment from the points still to visit
+            full = list(range(len(segment) + 1)) + [len(window) - 2]
+            shifted = []
+        else:
+            lo, hi = s - 1, k + 1
+            window = [path[s - 1]] + path[e + 1:k + 1] + segment + [path[k + 1]]
+            # The steps in between now have the segment still to visit, so only it can shield them
+            middle = k - e
+            full = [0] + list(range(middle, len(window) - 1))
+            shifted = list(range(1, middle))
+        pos = self.pos.copy()
+        pos[window] = np.arange(lo, hi + 1)
+        clear = self._steps_clear([window[t] for t in full], [window[t + 1] for t in full], pos)
+        if clear and shifted:
+            clear = self._steps_avoid([window[t] for t in shifted], [window[t + 1] for t in shifted], segment)
+        if not clear:
+            self.rejected += 1
+            return False
+        if self.stats.on_node is not None:
+            self.stats.on_node(path[s], None, self.length + delta)
+        path[lo:hi + 1] = window
+        self.pos = pos
+        self.length += delta
+        self.moves += 1
+        self._touch([window[0], window[1], window[-2], window[-1]])
+        return True
+
+    def _try_or_opt(self, u):
+        path, d, x, y = self.path, self._d, self.x, self.y
+        s = int(self.pos[u])
+        for size in range(1, self.OR_OPT_MAX_SEGMENT + 1):
+            e = s + size - 1
+            if s < 1 or e >= self.last:
+                break
+            segment = path[s:e + 1]
+            p, q = path[s - 1], path[e + 1]
+            removed = d(p, segment[0]) + d(segment[-1], q) - d(p, q)
+            reverse = segment[::-1]
+            # Place the segment so that one of its ends becomes adjacent to a neighbor c of that end
+            for end_point, after_c, before_c in ((segment[0], segment, reverse), (segment[-1], reverse, segment)):
+                for c in self.neighbors[end_point]:
+                    pc = int(self.pos[c])
+                    for k, oriented in ((pc, after_c), (pc - 1, before_c)):
+                        if k < 0 or k >= self.last or s - 1 <= k <= e:
+                            continue
+                        a, b = path[k], path[k + 1]
+                        first, last = oriented[0], oriented[-1]
+                        delta = (abs(x[a] - x[first]) + abs(y[a] - y[first]) + abs(x[last] - x[b]) + abs(y[last] - y[b])
+                                 - abs(x[a] - x[b]) - abs(y[a] - y[b]) - removed)
+                        if delta < 0 and self._apply_or_opt(s, e, k, oriented, delta):
+                            return True
+        return False
+
+    def _descend(self, deadline):
+        """ Apply improving moves around queued points until none is left or time runs out """
+        end = self.path[-1]
+        while self._queue:
+            if time.perf_counter() >= deadline:
+                return
+            u = self._queue.popleft()
+            self._queued[u] = False
+            if u != end and (self._try_two_opt(u) or self._try_or_opt(u)):
+                self._touch([u])
+
+    def _kick(self):
+        """ Reverse a random short segment whatever it costs, returns False if no reversal was valid """
+        path, d = self.path, self._d
+        for _ in range(self.KICK_ATTEMPTS):
+            i = self.random.randrange(0, self.last - 2)
+            j = min(self.last - 1, i + self.random.randint(2, self.KICK_MAX_SEGMENT))
+            a, b, c, e = path[i], path[i + 1], path[j], path[j + 1]
+            if self._apply_two_opt(i, j, d(a, c) + d(b, e) - d(a, b) - d(c, e)):
+                return True
+        return False
+
+    def improve(self):
+        """ Improve the path until time_limit after construction and return (best path, best distance) """
+        deadline = self._started + self.time_limit
+        moves, rejected = self.moves, self.rejected
+        self._touch(self.path[:-1])
+        with self.stats.phase("search"):
+            while True:
+                self._descend(deadline)
+                if self.length < self.best_length:
+                    self.best_path, self.best_length = list(self.path), self.length
+                if time.perf_counter() >= deadline or self.last < 3:
+                    break
+                if self.length > self.best_length:
+                    # Kicks start over from the best path
+                    self.path = list(self.best_path)
+                    self.pos[self.path] = np.arange(len(self.path))
+                    self.length = self.best_length
+                if not self._kick():
+                    break
+        self.stats.expanded += self.moves - moves
+        self.stats.shielded += self.rejected - rejected
+        return path_array(self.best_path), self.best_length
+
+
+def local_search_path(instance, time_limit=LOCAL_SEARCH_TIME_LIMIT, path=None, stats=None):
+    """ Anytime 2-opt / Or-opt improvement of path, or of the nearest neighbor path, returns (path, distance) """
+    return LocalSearch(instance, path, time_limit, stats=stats).improve()
+
+
+class IncrementalSearch(LocalSearch):
+    """ A valid path kept up to date while points are inserted, deleted and moved.
+
+    A new or moved point goes into the cheapest of the INSERTION_CANDIDATES cheapest gaps where it
+    shields no earlier step and neither of its steps is shielded, and the neighbors of a removed point
+    are joined. If no such gap is found the point goes into the cheapest gap that keeps the earlier
+    steps clear, and every shielded step is repaired by pulling the point shielding it that is
+    closest to its source in behind the source. That point is never shielded itself, since anything
+    inside its box would be closer still. Then 2-opt and Or-opt moves run around the edit for
+    improve_time seconds. Neighbor lists are patched rather than rebuilt, so an edit costs a few
+    linear passes over the points.
+
+    Deleting a point renumbers the later points like deleting from a list. With exact set, instances
+    small enough for Held-Karp are re-solved after every edit, and larger ones by branch and bound
+    seeded with the repaired path and keeping its cached spanning tree lengths for the subsets an
+    edit did not touch, stopping after exact_time_limit seconds if given.
+    """
+
+    def __init__(self, instance, path=None, exact=False, exact_time_limit=None, improve_time=INCREMENTAL_IMPROVE_TIME, stats=None):
+        super().__init__(instance, path, time_limit=improve_time, stats=stats)
+        # Edits change the coordinates in place, so they must not be the instance's own
+        self.xs, self.ys = self.xs.copy(), self.ys.copy()
+        self.start_index, self.end_index = instance.start_index, instance.end_index
+        self.neighbors = np.array(self.neighbors, dtype=np.int64).reshape(len(self.x), -1)
+        self.exact = exact
+        self.exact_time_limit = exact_time_limit
+        self._mst_cache = OrderedDict()
+
+    @property
+    def instance(self):
+        """ The current points as an Instance, rebuilt after an edit """
+        if self._instance is None:
+            self._instance = Instance(np.column_stack((self.xs, self.ys)), self.start_index, self.end_index)
+        return self._instance
+
+    @instance.setter
+    def instance(self, instance):
+        self._instance = instance
+
+    @property
+    def route(self):
+        """ (path, distance) of the current path """
+        return path_array(self.path), self.length
+
+    def _distances_from(self, x, y):
+        return np.abs(self.xs.astype(np.int64) - x) + np.abs(self.ys.astype(np.int64) - y)
+
+    def _neighbor_row(self, i):
+        distance = self._distances_from(self.x[i], self.y[i])
+        distance[i] = np.iinfo(np.int64).max
+        count = self.neighbors.shape[1]
+        closest = np.argpartition(distance, count - 1)[:count]
+        return closest[np.argsort(distance[closest], kind="stable")]
+
+    def _update_neighbors(self, changed):
+        """ Refresh the neighbor lists after the points in changed were added or moved """
+        count = min(self.NEIGHBORS, len(self.x) - 1)
+        if self.neighbors.shape[1] != count or count == 0:
+            self.neighbors = nearest_neighbor_lists(self.xs, self.ys, self.NEIGHBORS).reshape(len(self.x), -1)
+            return
+        # Lists that held a changed point, or whose farthest neighbor is farther than one now is
+        farthest = self.neighbors[:, -1]
+        reach = np.abs(self.xs.astype(np.int64) - self.xs[farthest]) + np.abs(self.ys.astype(np.int64) - self.ys[farthest])
+        stale = np.isin(self.neighbors, changed).any(axis=1)
+        for c in changed:
+            stale |= self._distances_from(self.x[c], self.y[c]) < reach
+        stale[changed] = True
+        for i in np.flatnonzero(stale):
+            self.neighbors[i] = self._neighbor_row(i)
+
+    def _set_positions(self, start):
+        self.pos[self.path[start:]] = np.arange(start, len(self.path))
+
+    def _unlink(self, i):
+        """ Take point i out of the path, returns the point before it """
+        k = int(self.pos[i])
+        del self.path[k]
+        self._set_positions(k)
+        self.last -= 1
+        return self.path[k - 1]
+
+    def _link(self, p):
+        """ Put point p into the cheapest clear gap, or the cheapest gap that keeps earlier steps clear """
+        path = np.asarray(self.path)
+        xs, ys = self.xs.astype(np.int64), self.ys.astype(np.int64)
+        a, b = path[:-1], path[1:]
+        x, y = xs[p], ys[p]
+        delta = np.abs(xs[a] - x) + np.abs(ys[a] - y) + np.abs(xs[b] - x) + np.abs(ys[b] - y) - np.abs(xs[a] - xs[b]) - np.abs(ys[a] - ys[b])
+        # p is still to be visited during every step before its gap, so those must not have it inside their box
+        inside = ((np.minimum(xs[a], xs[b]) < x) & (x < np.maximum(xs[a], xs[b]))
+                  & (np.minimum(ys[a], ys[b]) < y) & (y < np.maximum(ys[a], ys[b])))
+        gaps = int(np.argmax(inside)) + 1 if inside.any() else len(a)
+        candidates = np.argsort(delta[:gaps], kind="stable")
+        k = int(candidates[0])
+        for gap in candidates[:INSERTION_CANDIDATES].tolist():
+            if (self._steps_avoid([path[gap]], [p], path[gap + 1:self.last])
+                    and self._steps_avoid([p], [path[gap + 1]], path[gap + 2:self.last])):
+                k = gap
+                break
+        self.path.insert(k + 1, p)
+        self._set_positions(k + 1)
+        self.last += 1
+        return self._repair([self.path[k], p])
+
+    def _repair(self, sources):
+        """ Clear the steps out of sources by pulling shielding points in behind them, nearest first.
+
+        Returns False if that took more moves than there are points, which should not happen.
+        """
+        pending = list(sources)
+        budget = len(self.path)
+        xs, ys = self.xs, self.ys
+        while pending:
+            a = pending.pop()
+            k = int(self.pos[a])
+            if k >= self.last:
+                continue
+            b = self.path[k + 1]
+            later = np.asarray(self.path[k + 2:self.last], dtype=np.int64)
+            low_x, high_x = min(self.x[a], self.x[b]), max(self.x[a], self.x[b])
+            low_y, high_y = min(self.y[a], self.y[b]), max(self.y[a], self.y[b])
+            lx, ly = xs[later], ys[later]
+            shielding = later[(low_x < lx) & (lx < high_x) & (low_y < ly) & (ly < high_y)]
+            if shielding.size == 0:
+                continue
+            budget -= 1
+            if budget < 0:
+                return False
+            sx, sy = xs[shielding].astype(np.int64), ys[shielding].astype(np.int64)
+            q = int(shielding[np.argmin(np.abs(sx - self.x[a]) + np.abs(sy - self.y[a]))])
+            j = int(self.pos[q])
+            c = self.path[j - 1]
+            del self.path[j]
+            self.path.insert(k + 1, q)
+            self.pos[self.path[k + 1:j + 1]] = np.arange(k + 1, j + 1)
+            self._touch([a, q, c])
+            pending += [c, q]
+        return True
+
+    def _settle(self, touched, repaired, dropped_cache):
+        """ Finish an edit: fall back to a fresh path if the repair failed, improve and re-solve if exact """
+        self._instance = None
+        if dropped_cache:
+            self._mst_cache = OrderedDict()
+        if not repaired:
+            path, _ = nearest_neighbor_path(self.instance)
+            self.path = path.tolist()
+            self._set_positions(0)
+            touched = self.path[:-1]
+        self._touch([t for t in touched if t != self.end_index])
+        self.length = self.instance.path_distance(self.path)
+        self._descend(time.perf_counter() + self.time_limit)
+        if self.exact:
+            self._solve_exactly()
+        self.best_path, self.best_length = list(self.path), self.length
+
+    def _solve_exactly(self):
+        instance = self.instance
+        if instance.size - 2 <= HELD_KARP_MAX_POINTS:
+            path, distance = held_karp_path(instance)
+        else:
+            search = BranchAndBound(instance, time_limit=self.exact_time_limit, seed=False)
+            search.incumbent_path, search.incumbent = path_array(self.path), self.length
+            search._mst_cache = self._mst_cache
+            path, distance = search.solve()
+        if path is not None and distance < self.length:
+            self.path = path.tolist()
+            self._set_positions(0)
+            self.length = distance
+
+    def _check_coordinates(self, x, y):
+        limits = np.iinfo(np.int32)
+        if not (limits.min <= x <= limits.max and limits.min <= y <= limits.max):
+            raise ValueError("Coordinates must fit in 32-bit integers.")
+
+    def insert_point(self, x, y):
+        """ Add a point at (x, y) to the path and return its index """
+        self._check_coordinates(x, y)
+        p = len(self.x)
+        self.xs, self.ys = np.append(self.xs, np.int32(x)), np.append(self.ys, np.int32(y))
+        self.x.append(int(x))
+        self.y.append(int(y))
+        self.pos = np.append(self.pos, 0)
+        self._queued = np.append(self._queued, False)
+        self.neighbors = np.vstack((self.neighbors, np.zeros((1, self.neighbors.shape[1]), dtype=np.int64)))
+        self._update_neighbors([p])
+        repaired = self._link(p)
+        # The new point is in none of the cached subsets
+        self._settle(self.path[max(0, int(self.pos[p]) - 1):int(self.pos[p]) + 2], repaired, False)
+        return p
+
+    def delete_point(self, i):
+        """ Remove point i from the path, the points after it move down one index """
+        if i in (self.start_index, self.end_index):
+            raise ValueError("The start and end points cannot be deleted.")
+        before = self._unlink(i)
+        repaired = self._repair([before])
+        # Renumber everything past i
+        path = np.asarray(self.path)
+        self.path = (path - (path > i)).tolist()
+        before -= before > i
+        self.start_index -= self.start_index > i
+        self.end_index -= self.end_index > i
+        self.xs, self.ys = np.delete(self.xs, i), np.delete(self.ys, i)
+        del self.x[i], self.y[i]
+        self.pos = np.delete(self.pos, i)
+        self._queued = np.delete(self._queued, i)
+        self._queue = deque(q - (q > i) for q in self._queue if q != i)
+        held = np.flatnonzero((self.neighbors == i).any(axis=1))
+        held -= held > i
+        self.neighbors = np.delete(self.neighbors, i, axis=0)
+        self.neighbors -= self.neighbors > i
+        if self.neighbors.shape[1] != min(self.NEIGHBORS, len(self.x) - 1):
+            self._update_neighbors([])
+        else:
+            for r in held.tolist():
+                self.neighbors[r] = self._neighbor_row(r)
+        self._settle([before, self.path[int(self.pos[before]) + 1]], repaired, True)
+
+    def move_point(self, i, x, y):
+        """ Move point i to (x, y) and repair the path around its new place """
+        self._check_coordinates(x, y)
+        if i == self.start_index or i == self.end_index:
+            self.xs[i], self.ys[i] = x, y
+            self.x[i], self.y[i] = int(x), int(y)
+            self._update_neighbors([i])
+            k = int(self.pos[i])
+            sources = [i] if k == 0 else [self.path[k - 1]]
+            self._settle(sources + [i], self._repair(sources), i == self.end_index)
+            return
+        before = self._unlink(i)
+        self.xs[i], self.ys[i] = x, y
+        self.x[i], self.y[i] = int(x), int(y)
+        self._update_neighbors([i])
+        repaired = self._repair([before]) and self._link(i)
+        self._mst_cache = OrderedDict((remaining, length) for remaining, length in self._mst_cache.items() if not remaining >> i & 1)
+        k = int(self.pos[i])
+        self._settle([before] + self.path[k - 1:k + 2], repaired, False)
+
+
+# State of a parallel branch and bound worker process, set up by _init_parallel_worker
+_parallel_state = {}
+
+
+def _init_parallel_worker(coords, start_index, end_index, shared_incumbent, cancel, table_bytes):
+    _parallel_state["instance"] = Instance(coords, start_index, end_index)
+    _parallel_state["shared_incumbent"] = shared_incumbent
+    _parallel_state["cancel"] = cancel
+    _parallel_state["table_bytes"] = table_bytes
+
+
+def _solve_subtree(prefix):
+    """ Search the completions of one prefix, returns (path, distance, stats as a dict) """
+    cancel = _parallel_state["cancel"]
+    if cancel is not None and cancel.is_set():
+        # Prefixes still queued when the search is cancelled are not started
+        return None, float("inf"), SolverStats().as_dict()
+    search = BranchAndBound(
+        _parallel_state["instance"],
+        cancel=_parallel_state["cancel"],
+        shared_incumbent=_parallel_state["shared_incumbent"],
+        seed=False,
+        table_bytes=_parallel_state["table_bytes"],
+    )
+    path, distance = search.solve(prefix)
+    return path, distance, search.stats.as_dict()
+
+
+def split_prefixes(search, count):
+    """ Expand valid prefixes from the start breadth first until there are at least count of them.
+
+    Prefixes whose bound cannot beat the search's incumbent are dropped. Returns (bound, prefix)
+    pairs, cheapest bound first.
+    """
+    instance = search.instance
+    rows = search.rows
+    frontier = [(search.bound(instance.start_index, instance.interior_mask), 0, [instance.start_index], instance.interior_mask)]
+    while len(frontier) < count:
+        expanded = []
+        for entry in frontier:
+            _, cost, prefix, remaining = entry
+            if not remaining:
+                expanded.append(entry)
+                continue
+            last = prefix[-1]
+            for p in iter_bits(remaining):
+                if not instance.valid_path(last, p, remaining):
+                    continue
+                child_cost = cost + rows[last][p]
+                child_remaining = remaining & ~(1 << p)
+                child_bound = child_cost + search.bound(p, child_remaining)
+                if child_bound < search.incumbent:
+                    expanded.append((child_bound, child_cost, prefix + [p], child_remaining))
+        if expanded == frontier:
+            break
+        frontier = expanded
+    frontier.sort(key=lambda entry: entry[0])
+    return [(bound, prefix) for bound, _, prefix, _ in frontier]
+
+
+def parallel_branch_and_bound_path(instance, workers=None, progress=None, cancel=None, stats=None,
+                                   table_bytes=TRANSPOSITION_TABLE_BYTES):
+    """ Exact branch and bound with the search tree split across a process pool.
+
+    The tree is cut into the subtrees below the first few moves from the start point, about
+    PARALLEL_PREFIXES_PER_WORKER per worker, and every worker prunes against the best distance found
+    by any of them. It finds the same optimal distance as branch_and_bound_path. stats sums up the
+    workers' stats, with their phase times added together. table_bytes is split evenly between the
+    workers' transposition tables.
+
+    The lower bound is the smallest of the best distance, the bounds of the subtrees not searched
+    yet and the bounds the cancelled subtree searches got to, so it is proven once every subtree
+    finished.
+    """
+    stats = SolverStats() if stats is None else stats
+    workers = workers or os.cpu_count()
+    search = BranchAndBound(instance, stats=stats)
+    search._seed()
+    best_path, best = search.incumbent_path, search.incumbent
+    with stats.phase("split"):
+        prefixes = split_prefixes(search, workers * PARALLEL_PREFIXES_PER_WORKER)
+
+    shared_incumbent = multiprocessing.Value("d", best)
+    initargs = (instance.coords, instance.start_index, instance.end_index, shared_incumbent, cancel, table_bytes // workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_parallel_worker, initargs=initargs) as pool:
+        # Lower bounds of the subtrees not searched to the end, by future until they are done
+        bounds = {pool.submit(_solve_subtree, prefix): bound for bound, prefix in prefixes}
+        unfinished = []
+        pending = set(bounds)
+        while pending:
+            # Wake up now and then to notice a cancel even while every running subtree is still busy
+            done, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, distance, worker_stats = future.result()
+                bound = bounds.pop(future)
+                stats.merge(worker_stats)
+                if not worker_stats["proven"]:
+                    # A subtree skipped after a cancel still has the bound of its prefix
+                    unfinished.append(bound if worker_stats["lower_bound"] is None else worker_stats["lower_bound"])
+                if path is not None and distance < best:
+                    best_path, best = path, distance
+                if progress is not None:
+                    lower_bound = min([best] + list(bounds.values()) + unfinished)
+                    progress({"expanded": stats.expanded, "pruned": stats.total_pruned, "best": best, "path": best_path,
+                              "lower_bound": lower_bound, "gap": best - lower_bound, "proven": False, "stats": stats.as_dict()})
+            if cancel is not None and cancel.is_set():
+                # Queued subtrees are dropped, running ones see the event and return their best so far, and
+                # leaving the with block waits for them so no worker outlives the search
+                pending = {future for future in pending if not future.cancel()}
+    stats.bound(min([best] + list(bounds.values()) + unfinished), not bounds and not unfinished)
+    if best_path is None:
+        return None, float("inf")
+    return best_path, best
+
+
+def optimal_path(instance, progress=None, cancel=None, workers=1, stats=None, table_bytes=TRANSPOSITION_TABLE_BYTES):
+    """ Held-Karp when the instance is small enough for it, otherwise branch and bound over workers processes """
+    if instance.size - 2 <= HELD_KARP_MAX_POINTS:
+        return held_karp_path(instance, progress, cancel, stats)
+    if workers == 1:
+        return branch_and_bound_path(instance, progress=progress, cancel=cancel, stats=stats, table_bytes=table_bytes)
+    return parallel_branch_and_bound_path(instance, workers, progress, cancel, stats, table_bytes)
+
+
+def search_worker(coords, start_index, end_index, updates, cancel, workers=None):
+    """ Process entry point for a background optimal_path search over an (n, 2) coordinate array.
+
+    Puts ("progress", stats) on the updates queue at most every PROGRESS_INTERVAL seconds, or at once
+    when a better path is found, then ("done", path, distance, cancelled, stats) when the search ends,
+    the last with the SolverStats as a dict. The best path is only sent along when it changes. Large
+    instances are split over workers processes.
+    """
+    last_sent = {"time": 0.0, "best": float("inf")}
+
+    def progress(stats):
+        now = time.perf_counter()
+        improved = stats["best"] < last_sent["best"]
+        if improved or now - last_sent["time"] >= PROGRESS_INTERVAL:
+            updates.put(("progress", dict(stats, path=stats["path"] if improved else None)))
+            last_sent["time"], last_sent["best"] = now, stats["best"]
+
+    stats = SolverStats()
+    path, distance = optimal_path(Instance(coords, start_index, end_index), progress, cancel, workers, stats)
+    updates.put(("done", path, distance, cancel.is_set(), stats.as_dict()))
+
+
+# Solvers selectable from the command line, each maps an Instance to (path, distance) and fills in
+# the SolverStats passed as stats
+SOLVERS = {
+    "optimal": optimal_path,
+    "held-karp": held_karp_path,
+    "bidirectional": bidirectional_path,
+    "branch-and-bound": branch_and_bound_path,
+    "parallel": parallel_branch_and_bound_path,
+    "simple": simple_path,
+    "nearest-neighbor": nearest_neighbor_path,
+    "local-search": local_search_path,
+}
+
+# Solvers that accept a time_limit in seconds
+TIME_LIMITED_SOLVERS = {"branch-and-bound", "local-search"}
+
+# Solvers that accept a table_bytes cap on their transposition tables
+TABLE_SOLVERS = {"optimal", "branch-and-bound", "parallel"}
+
+# Solvers whose paths are optimal when they run without a time limit, so they can be cached
+EXACT_SOLVERS = {"optimal", "held-karp", "bidirectional", "branch-and-bound", "parallel"}
+
+
+def write_path(file, segments, total_distance):
+    """ Write path segments as "Path i: p1 -> p2" lines followed by the total length.
+
+    segments can be any iterable, lines are written EXPORT_CHUNK_SIZE at a time so long paths are
+    streamed out rather than built up as one string.
+    """
+    path_info = (f"Path {i+1}: {p1} -> {p2}" for i, (p1, p2) in enumerate(segments))
+    separator = ""
+    for chunk in iter(lambda: list(islice(path_info, EXPORT_CHUNK_SIZE)), []):
+        file.write(separator + "\n".join(chunk))
+        separator = "\n"
+    file.write(f"\nTotal Path Length: {total_distance}")
+
+
+def _write_chunks(file, array, dtype):
+    """ Write an array to a binary file EXPORT_CHUNK_SIZE elements at a time, so it is never copied whole """
+    for start in range(0, len(array), EXPORT_CHUNK_SIZE):
+        file.write(np.asarray(array[start:start + EXPORT_CHUNK_SIZE]).astype(dtype, copy=False).tobytes())
+
+
+def save_binary(filename, instance, path=None, distance=None):
+    """ Write an instance, and optionally a path through it with its distance, as a binary instance file.
+
+    The file is written next to filename under a temporary name and then renamed over it, so saving
+    an instance loaded from the same file never truncates the memory-mapped arrays being written.
+    """
+    length = 0 if path is None else len(path)
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)), suffix=BINARY_SUFFIX + ".tmp")
+    try:
+        # mkstemp makes the file private, give it the permissions open() would have
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temporary, 0o666 & ~umask)
+        with os.fdopen(descriptor, "wb") as file:
+            header = BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, instance.start_index, instance.end_index,
+                                        instance.size, length, -1 if distance is None else distance)
+            file.write(header.ljust(BINARY_HEADER_SIZE, b"\0"))
+            _write_chunks(file, instance.xs, "<i4")
+            _write_chunks(file, instance.ys, "<i4")
+            if path is not None:
+                _write_chunks(file, path, "<i4")
+        os.replace(temporary, filename)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def load_binary(filename, mmap=True):
+    """ Read a binary instance file, returns (instance, path, distance) with path and distance None if it has none.
+
+    With mmap the coordinates and path are memory-mapped read-only views of the file rather than
+    read into memory, so even huge instances open at once and pages are only read when used.
+    """
+    with open(filename, "rb") as file:
+        header = file.read(BINARY_HEADER_SIZE)
+        file_size = os.fstat(file.fileno()).st_size
+    if len(header) < BINARY_HEADER_SIZE or header[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError(f"{filename} is not a binary instance file.")
+    _, version, start_index, end_index, size, length, distance = BINARY_HEADER.unpack_from(header)
+    if version != BINARY_VERSION:
+        raise ValueError(f"{filename} has unsupported version {version}.")
+    count = 2 * size + length
+    if size < 2 or length < 0 or file_size != BINARY_HEADER_SIZE + 4 * count:
+        raise ValueError(f"{filename} is truncated or corrupt.")
+    if mmap:
+        data = np.memmap(filename, dtype="<i4", mode="r", offset=BINARY_HEADER_SIZE, shape=(count,))
+    else:
+        data = np.fromfile(filename, dtype="<i4", count=count, offset=BINARY_HEADER_SIZE)
+    # A no-op on little-endian machines, the usual case, and a byte-swapped copy elsewhere
+    data = data.astype(np.int32, copy=False)
+    instance = Instance.from_arrays(data[:size], data[size:2 * size], start_index, end_index)
+    if length == 0:
+        return instance, None, None
+    return instance, data[2 * size:], None if distance < 0 else distance
+
+
+def parse_instance(line):
+    """ Parse one JSON line into (points, start_index, end_index) """
+    data = json.loads(line)
+    if isinstance(data, list):
+        data = {"points": data}
+    return data["points"], data.get("start", 0), data.get("end", 1)
+
+
+def read_instances(sources):
+    """ Yield (source, line number, raw line) for every non-blank line of the given files, "-" is stdin.
+
+    A binary instance file is yielded once as (source, None, None) and loaded by whoever solves it. A
+    file that cannot be read is yielded as (source, None, the OSError), so it gets an error result.
+    """
+    for source in sources:
+        if source.endswith(BINARY_SUFFIX):
+            yield source, None, None
+            continue
+        try:
+            file = sys.stdin if source == "-" else open(source)
+        except OSError as error:
+            yield source, None, error
+            continue
+        try:
+            for number, line in enumerate(file, 1):
+                if line.strip():
+                    yield source, number, line
+        except OSError as error:
+            yield source, None, error
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+
+def solve_job(job, solver=None, with_stats=False, cache=None):
+    """ Solve one (source, line number, raw line, method) job, returning a JSON-ready result.
+
+    With a SolutionCache, a cached path is returned without solving and new paths are stored.
+    lower_bound and gap are None unless the solver proved a bound, proven says the path is optimal.
+    """
+    source, number, line, method = job
+    result = {"source": source, "line": number, "method": method}
+    stats = SolverStats()
+    try:
+        if isinstance(line, OSError):
+            raise line
+        if line is None:
+            instance = load_binary(source)[0]
+        else:
+            instance = Instance(*parse_instance(line))
+        cached = None if cache is None else cache.get(instance)
+        if cached is not None:
+            path, distance = cached
+            result["cached"] = True
+        else:
+            path, distance = (solver or SOLVERS[method])(instance, stats=stats)
+            if cache is not None and path is not None:
+                cache.put(instance, path, distance)
+    except (ValueError, KeyError, TypeError, IndexError, OSError) as error:
+        result["error"] = str(error)
+        return result
+    result["distance"] = distance if path is not None else None
+    result["path"] = None if path is None else path.tolist()
+    # A cached path was solved exactly, heuristics leave the bound unknown
+    lower_bound, proven = (distance, True) if cached is not None else (stats.lower_bound, stats.proven)
+    known = path is not None and lower_bound is not None and math.isfinite(lower_bound)
+    result["lower_bound"] = lower_bound if known else None
+    result["gap"] = distance - lower_bound if known else None
+    result["proven"] = proven and path is not None
+    if with_stats:
+        result["stats"] = stats.as_dict()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve L1 TSPP instances from JSON-lines files or stdin.")
+    parser.add_argument("sources", nargs="*", default=["-"], help="instance files, - for stdin (default)")
+    parser.add_argument("--method", choices=sorted(SOLVERS), default="optimal")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=4, help="instances read ahead per worker")
+    parser.add_argument("--time-limit", type=float, default=None, help="seconds per instance for branch-and-bound and local-search")
+    parser.add_argument("--stats", action="store_true", help="add each solver's stats to its result")
+    parser.add_argument("--cache", metavar="PATH", help="solution cache file for the exact methods")
+    parser.add_argument("--table-mb", type=float, default=TRANSPOSITION_TABLE_BYTES / 2**20,
+                        help="megabytes of branch and bound transposition table per instance")
+    args = parser.parse_args(argv)
+
+    time_limited = args.time_limit is not None and args.method in TIME_LIMITED_SOLVERS
+    cache = None
+    if args.cache and args.method in EXACT_SOLVERS and not time_limited:
+        cache = SolutionCache(args.cache)
+    jobs = ((source, number, line, args.method) for source, number, line in read_instances(args.sources))
+    table_bytes = int(args.table_mb * 2**20)
+    if args.method == "parallel":
+        # The parallel solver spreads each instance over the workers itself, so instances go one at a time
+        solver = partial(parallel_branch_and_bound_path, workers=args.workers, table_bytes=table_bytes)
+        return write_results(solve_job(job, solver, args.stats, cache) for job in jobs)
+    options = {}
+    if time_limited:
+        options["time_limit"] = args.time_limit
+    if args.method in TABLE_SOLVERS:
+        options["table_bytes"] = table_bytes
+    solver = partial(SOLVERS[args.method], **options) if options else None
+    workers = args.workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        job_solver = partial(solve_job, solver=solver, with_stats=args.stats, cache=cache)
+        return write_results(ordered_results(pool, job_solver, jobs, workers * args.chunksize))
+
+
+def ordered_results(pool, function, jobs, window):
+    """ Run function over jobs on pool with about window jobs in flight, yielding results in input order.
+
+    Jobs are read and submitted from a separate thread, so a finished result is written while the next
+    input line is still on its way, and reading waits while window results are not written yet.
+    """
+    futures = queue.Queue(maxsize=window)
+
+    def submit():
+        try:
+            for job in jobs:
+                futures.put(pool.submit(function, job))
+        except BaseException as error:
+            futures.put(error)
+        else:
+            futures.put(None)
+
+    # A daemon thread, so results left unread do not keep the process waiting on input
+    threading.Thread(target=submit, daemon=True).start()
+    while True:
+        future = futures.get()
+        if future is None:
+            return
+        if isinstance(future, BaseException):
+            raise future
+        yield future.result()
+
+
+def write_results(results):
+    """ Stream results to stdout as JSON lines, returns the exit status """
+    failed = False
+    for result in results:
+        failed = failed or "error" in result
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())